@@ -1,5 +1,7 @@
 import os
 
+import pytest
+
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 root_dir_content = os.listdir(BASE_DIR)
 PROJECT_DIR_NAME = 'yatube'
@@ -37,3 +39,11 @@ pytest_plugins = [
     'tests.fixtures.fixture_user',
     'tests.fixtures.fixture_data',
 ]
+
+
+@pytest.fixture(autouse=True)
+def strict_query_watch(settings):
+    # Виды с query_budget роняют тест при выходе за бюджет или N+1
+    settings.QUERY_WATCH = 'strict'
+    settings.DATABASE_REPLICAS = []
+    settings.THUMBNAIL_WORKERS = 0
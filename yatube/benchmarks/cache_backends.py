@@ -0,0 +1,109 @@
+"""Сравнение LocMemCache и общего SQLiteCache на нескольких процессах.
+
+Каждый процесс изображает воркер gunicorn: запрашивает страницы ленты
+с распределением Ципфа и при промахе "рендерит" страницу и кладёт её
+в кэш. Запуск из каталога yatube/:
+
+    python -m benchmarks.cache_backends --workers 4 --requests 5000
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import random
+import statistics
+import tempfile
+import time
+
+from django.core.cache.backends.locmem import LocMemCache
+
+from core.cache import SQLiteCache
+
+PAGE = 'x' * 20000
+
+
+def make_backend(name, directory):
+    if name == 'locmem':
+        return LocMemCache('bench', {'OPTIONS': {'MAX_ENTRIES': 10000}})
+    return SQLiteCache(
+        os.path.join(directory, 'cache.sqlite3'),
+        {'OPTIONS': {'MAX_ENTRIES': 10000}},
+    )
+
+
+def worker(name, directory, options, seed, results):
+    backend = make_backend(name, directory)
+    rng = random.Random(seed)
+    weights = [1 / rank for rank in range(1, options['pages'] + 1)]
+    keys = rng.choices(
+        range(options['pages']), weights=weights, k=options['requests']
+    )
+    hits = 0
+    latencies = []
+    for key in keys:
+        started = time.perf_counter()
+        value = backend.get(f'page:{key}')
+        latencies.append(time.perf_counter() - started)
+        if value is None:
+            time.sleep(options['render_ms'] / 1000)
+            backend.set(f'page:{key}', PAGE, 300)
+        else:
+            hits += 1
+    results.put((hits, latencies))
+
+
+def run(name, options):
+    with tempfile.TemporaryDirectory() as directory:
+        make_backend(name, directory).clear()
+        results = multiprocessing.Queue()
+        processes = [
+            multiprocessing.Process(
+                target=worker,
+                args=(name, directory, options, seed, results),
+            )
+            for seed in range(options['workers'])
+        ]
+        started = time.perf_counter()
+        for process in processes:
+            process.start()
+        collected = [results.get() for _ in processes]
+        for process in processes:
+            process.join()
+        elapsed = time.perf_counter() - started
+    latencies = sorted(
+        latency for _, worker_latencies in collected
+        for latency in worker_latencies
+    )
+    total = len(latencies)
+    return {
+        'backend': name,
+        'hit_rate': sum(hits for hits, _ in collected) / total,
+        'get_p50_us': statistics.median(latencies) * 1e6,
+        'get_p95_us': latencies[int(total * 0.95)] * 1e6,
+        'elapsed_s': elapsed,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--requests', type=int, default=5000)
+    parser.add_argument('--pages', type=int, default=500)
+    parser.add_argument('--render-ms', type=float, default=2.0)
+    parser.add_argument('--json', help='куда записать результаты')
+    options = vars(parser.parse_args())
+    report = [run(name, options) for name in ('locmem', 'shared')]
+    for row in report:
+        print(
+            '{backend:>7}: hit rate {hit_rate:6.1%}, '
+            'get p50 {get_p50_us:7.1f} us, p95 {get_p95_us:7.1f} us, '
+            'total {elapsed_s:5.2f} s'.format(**row)
+        )
+    if options['json']:
+        with open(options['json'], 'w') as output:
+            json.dump({'options': options, 'results': report}, output,
+                      indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,18 @@
+"""Настройка Django для бенчмарков с профилем настроек bench."""
+import os
+
+import django
+
+
+def setup(data_dir=None):
+    """Поднимает Django с YATUBE_ENV=bench, не трогая данные проекта.
+
+    data_dir переопределяет каталог с базой, медиа и кэшем бенчмарков.
+    """
+    os.environ['YATUBE_ENV'] = 'bench'
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'yatube.settings')
+    if data_dir:
+        os.environ['YATUBE_BENCH_DIR'] = data_dir
+    from django.conf import settings
+    os.makedirs(settings.BENCH_DATA_DIR, exist_ok=True)
+    django.setup()
@@ -0,0 +1,267 @@
+"""Нагрузочный прогон видов yatube через WSGI-приложение.
+
+Потоки вызывают WSGI-приложение напрямую, как многопоточный сервер,
+выбирая виды по весам, а авторов, группы и посты - по закону Ципфа.
+Сначала данные создаёт benchmarks.seed; add_comment пишет в базу, так что
+перед сравнением коммитов её стоит пересоздать. Запуск из каталога yatube/:
+
+    python -m benchmarks.load --workers 8 --requests 5000 --json run.json
+"""
+import argparse
+import io
+import json
+import random
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from itertools import accumulate
+from urllib.parse import urlencode
+
+from benchmarks import environment
+
+# Доля каждого вида в нагрузке
+SCENARIOS = {
+    'index': 30,
+    'group_posts': 10,
+    'profile': 15,
+    'post_detail': 25,
+    'follow_index': 15,
+    'add_comment': 5,
+}
+
+
+def percentile(ordered, share):
+    """Перцентиль по ближайшему рангу из отсортированного списка."""
+    if not ordered:
+        return None
+    rank = max(1, round(share * len(ordered)))
+    return ordered[min(rank, len(ordered)) - 1]
+
+
+class Target:
+    """Данные, из которых собираются запросы, и WSGI-приложение."""
+
+    def __init__(self, alpha, sessions):
+        from django.conf import settings
+        from django.contrib.auth import get_user_model
+        from django.core.wsgi import get_wsgi_application
+        from django.test import Client
+        from django.urls import reverse
+
+        from posts.models import Group, Post
+
+        User = get_user_model()
+        self.application = get_wsgi_application()
+        self.usernames = list(
+            User.objects.order_by('pk').values_list('username', flat=True)
+        )
+        self.slugs = list(Group.objects.order_by('pk').values_list(
+            'slug', flat=True
+        ))
+        self.post_ids = list(
+            Post.objects.order_by('-pk').values_list('pk', flat=True)
+        )
+        if not self.post_ids:
+            sys.exit('Нет данных: сначала запустите python -m benchmarks.seed')
+        self.cum_weights = {
+            name: list(accumulate(
+                1 / rank ** alpha
+                for rank in range(1, len(getattr(self, name)) + 1)
+            ))
+            for name in ('usernames', 'slugs', 'post_ids')
+        }
+        # Токен CSRF - из куки, которую ставит страница с формой входа
+        client = Client()
+        client.get(reverse('users:login'))
+        self.csrf_token = client.cookies[settings.CSRF_COOKIE_NAME].value
+        self.cookies = []
+        for user in User.objects.order_by('pk')[:sessions]:
+            client = Client()
+            client.force_login(user)
+            self.cookies.append('; '.join((
+                f'{settings.SESSION_COOKIE_NAME}='
+                f'{client.cookies[settings.SESSION_COOKIE_NAME].value}',
+                f'{settings.CSRF_COOKIE_NAME}={self.csrf_token}',
+            )))
+
+    def pick(self, rng, name):
+        return rng.choices(
+            getattr(self, name), cum_weights=self.cum_weights[name]
+        )[0]
+
+    def build(self, scenario, rng):
+        """(метод, путь, тело, авторизован ли) для сценария."""
+        if scenario == 'index':
+            return 'GET', '/', None, False
+        if scenario == 'group_posts':
+            slug = self.pick(rng, 'slugs')
+            return 'GET', f'/group/{slug}/', None, False
+        if scenario == 'profile':
+            username = self.pick(rng, 'usernames')
+            return 'GET', f'/profile/{username}/', None, False
+        post_id = self.pick(rng, 'post_ids')
+        if scenario == 'post_detail':
+            return 'GET', f'/posts/{post_id}/', None, False
+        if scenario == 'follow_index':
+            return 'GET', '/follow/', None, True
+        body = urlencode({
+            'text': 'Комментарий из нагрузочного теста',
+            'csrfmiddlewaretoken': self.csrf_token,
+        })
+        return 'POST', f'/posts/{post_id}/comment/', body, True
+
+    def call(self, method, path, body, cookie):
+        body = (body or '').encode()
+        environ = {
+            'REQUEST_METHOD': method,
+            'PATH_INFO': path,
+            'QUERY_STRING': '',
+            'SERVER_NAME': 'localhost',
+            'SERVER_PORT': '80',
+            'SERVER_PROTOCOL': 'HTTP/1.1',
+            'HTTP_HOST': 'localhost',
+            'REMOTE_ADDR': '127.0.0.1',
+            'CONTENT_TYPE': 'application/x-www-form-urlencoded',
+            'CONTENT_LENGTH': str(len(body)),
+            'wsgi.input': io.BytesIO(body),
+            'wsgi.errors': sys.stderr,
+            'wsgi.url_scheme': 'http',
+            'wsgi.version': (1, 0),
+            'wsgi.multithread': True,
+            'wsgi.multiprocess': False,
+            'wsgi.run_once': False,
+        }
+        if cookie:
+            environ['HTTP_COOKIE'] = cookie
+        status = []
+        response = self.application(
+            environ, lambda code, headers, *args: status.append(code)
+        )
+        try:
+            for _ in response:
+                pass
+        finally:
+            if hasattr(response, 'close'):
+                response.close()
+        return int(status[0].split()[0])
+
+
+def run(target, options):
+    rng = random.Random(options['seed'])
+    scenarios = rng.choices(
+        list(SCENARIOS), weights=list(SCENARIOS.values()),
+        k=options['warmup'] + options['requests']
+    )
+    plan = [
+        (scenario, *target.build(scenario, rng), rng.choice(target.cookies))
+        for scenario in scenarios
+    ]
+    results = {scenario: [] for scenario in SCENARIOS}
+    errors = {scenario: 0 for scenario in SCENARIOS}
+    lock = threading.Lock()
+
+    def execute(step, record):
+        scenario, method, path, body, authorized, cookie = step
+        started = time.perf_counter()
+        status = target.call(method, path, body, cookie if authorized else '')
+        elapsed = time.perf_counter() - started
+        if record:
+            with lock:
+                results[scenario].append(elapsed)
+                # Форма комментария отвечает редиректом на пост; редирект
+                # GET-запроса значит, что сессия не сработала
+                if status != (302 if method == 'POST' else 200):
+                    errors[scenario] += 1
+
+    with ThreadPoolExecutor(options['workers']) as executor:
+        list(executor.map(
+            execute, plan[:options['warmup']], [False] * options['warmup']
+        ))
+        started = time.perf_counter()
+        list(executor.map(
+            execute, plan[options['warmup']:], [True] * options['requests']
+        ))
+        elapsed = time.perf_counter() - started
+    return summarize(results, errors, elapsed)
+
+
+def summarize(results, errors, elapsed):
+    def row(latencies, failed):
+        ordered = sorted(latencies)
+        return {
+            'requests': len(ordered),
+            'errors': failed,
+            'p50_ms': _ms(percentile(ordered, 0.50)),
+            'p95_ms': _ms(percentile(ordered, 0.95)),
+            'p99_ms': _ms(percentile(ordered, 0.99)),
+            'rps': len(ordered) / elapsed if elapsed else None,
+        }
+
+    report = {
+        scenario: row(latencies, errors[scenario])
+        for scenario, latencies in results.items()
+    }
+    report['total'] = row(
+        [latency for latencies in results.values() for latency in latencies],
+        sum(errors.values())
+    )
+    return report
+
+
+def _ms(seconds):
+    return None if seconds is None else round(seconds * 1000, 3)
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        '--data-dir', help='каталог данных вместо BENCH_DATA_DIR профиля bench'
+    )
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--warmup', type=int, default=200)
+    parser.add_argument('--sessions', type=int, default=50,
+                        help='сколько пользователей авторизовано')
+    parser.add_argument('--alpha', type=float, default=1.1)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--json', help='куда записать результаты')
+    options = vars(parser.parse_args())
+    environment.setup(options['data_dir'])
+    report = run(Target(options['alpha'], options['sessions']), options)
+    for scenario, row in report.items():
+        print(
+            '{name:>12}: {requests:5d} req, {errors:3d} err, '
+            'p50 {p50_ms:8.2f} ms, p95 {p95_ms:8.2f} ms, '
+            'p99 {p99_ms:8.2f} ms, {rps:8.1f} req/s'.format(
+                name=scenario, **row
+            )
+            if row['requests'] else f'{scenario:>12}: нет запросов'
+        )
+    if options['json']:
+        with open(options['json'], 'w') as output:
+            json.dump(
+                {
+                    'commit': git_commit(),
+                    'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+                    'options': options,
+                    'results': report,
+                },
+                output,
+                indent=2,
+            )
+
+
+if __name__ == '__main__':
+    main()
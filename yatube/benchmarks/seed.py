@@ -0,0 +1,181 @@
+"""Генератор данных для нагрузочных тестов.
+
+Создаёт пользователей, группы, посты с картинками, комментарии и граф
+подписок со степенным распределением: у немногих авторов тысячи
+читателей, у большинства - единицы. Один и тот же --seed даёт одни и
+те же данные. Запуск из каталога yatube/:
+
+    python -m benchmarks.seed --users 2000 --posts 20000
+"""
+import argparse
+import io
+import random
+import time
+
+from benchmarks import environment
+
+
+def zipf_weights(size, alpha):
+    return [1 / rank ** alpha for rank in range(1, size + 1)]
+
+
+def make_images(count, rng):
+    """Несколько разных PNG; посты ссылаются на них по кругу."""
+    from django.core.files.base import ContentFile
+    from PIL import Image
+
+    from posts.models import Post
+
+    storage = Post._meta.get_field('image').storage
+
+    names = []
+    for index in range(count):
+        color = tuple(rng.randrange(256) for _ in range(3))
+        buffer = io.BytesIO()
+        Image.new('RGB', (1200, 800), color).save(buffer, 'PNG')
+        # Хранилище по хэшу само не пишет файл, который уже есть
+        names.append(storage.save(
+            f'posts/bench_{index}.png', ContentFile(buffer.getvalue())
+        ))
+    return names
+
+
+def follow_graph(user_ids, rng, alpha, mean_following):
+    """Пары (читатель, автор): популярность автора по закону Ципфа."""
+    weights = zipf_weights(len(user_ids), alpha)
+    pairs = set()
+    for user_id in user_ids:
+        wanted = min(
+            len(user_ids) - 1,
+            max(1, int(rng.expovariate(1 / mean_following)))
+        )
+        authors = set(rng.choices(user_ids, weights=weights, k=wanted))
+        authors.discard(user_id)
+        pairs.update((user_id, author_id) for author_id in authors)
+    return sorted(pairs)
+
+
+def fill(options, rng):
+    """Строки всех таблиц через bulk_create; возвращает имена картинок."""
+    from django.contrib.auth import get_user_model
+
+    from posts.models import Comment, Follow, Group, Post
+
+    User = get_user_model()
+    User.objects.bulk_create(
+        User(
+            username=f'user{index}',
+            first_name='Пользователь',
+            last_name=str(index),
+        )
+        for index in range(options['users'])
+    )
+    user_ids = list(User.objects.order_by('pk').values_list('pk', flat=True))
+    Group.objects.bulk_create(
+        Group(
+            title=f'Группа {index}',
+            slug=f'group-{index}',
+            description='Группа для нагрузочного теста',
+        )
+        for index in range(options['groups'])
+    )
+    group_ids = list(Group.objects.values_list('pk', flat=True))
+    images = make_images(options['images'], rng)
+    authors = rng.choices(
+        user_ids,
+        weights=zipf_weights(len(user_ids), options['alpha']),
+        k=options['posts']
+    )
+    Post.objects.bulk_create(
+        Post(
+            author_id=author_id,
+            text=f'Пост {index} про кота, собаку и погоду',
+            group_id=rng.choice(group_ids + [None]),
+            image=images[index % len(images)] if images else '',
+        )
+        for index, author_id in enumerate(authors)
+    )
+    post_ids = list(Post.objects.order_by('pk').values_list('pk', flat=True))
+    Comment.objects.bulk_create(
+        Comment(
+            post_id=post_id,
+            author_id=rng.choice(user_ids),
+            text='Комментарий',
+        )
+        for post_id in rng.choices(
+            post_ids,
+            weights=zipf_weights(len(post_ids), options['alpha']),
+            k=options['comments']
+        )
+    )
+    Follow.objects.bulk_create(
+        Follow(user_id=user_id, author_id=author_id)
+        for user_id, author_id in follow_graph(
+            user_ids, rng, options['alpha'], options['following']
+        )
+    )
+    return images
+
+
+def seed(options):
+    from django.core.management import call_command
+    from django.db import connection, transaction
+
+    from posts import images, recommend, stats, thumbnails, timeline
+    from posts.models import Comment, Follow, Group, Post, User
+
+    rng = random.Random(options['seed'])
+    call_command('flush', interactive=False, verbosity=0)
+    with transaction.atomic():
+        names = fill(options, rng)
+        # bulk_create не шлёт сигналы, поэтому ленты, счётчики и
+        # рекомендации пересобираются одним проходом в конце
+        stats.recount_all()
+        timeline.rebuild()
+    images.recount()
+    recommend.recompute_all()
+    for name in names:
+        thumbnails.warm(name)
+    with connection.cursor() as cursor:
+        cursor.execute('ANALYZE')
+    return {
+        model.__name__.lower(): model.objects.count()
+        for model in (User, Group, Post, Comment, Follow)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        '--data-dir', help='каталог данных вместо BENCH_DATA_DIR профиля bench'
+    )
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--users', type=int, default=1000)
+    parser.add_argument('--groups', type=int, default=20)
+    parser.add_argument('--posts', type=int, default=10000)
+    parser.add_argument('--comments', type=int, default=30000)
+    parser.add_argument('--images', type=int, default=10)
+    parser.add_argument(
+        '--following', type=float, default=20,
+        help='среднее число подписок на пользователя'
+    )
+    parser.add_argument(
+        '--alpha', type=float, default=1.1,
+        help='показатель степенного распределения популярности'
+    )
+    options = vars(parser.parse_args())
+    environment.setup(options['data_dir'])
+    from django.conf import settings
+    from django.core.management import call_command
+    call_command('migrate', verbosity=0)
+    started = time.perf_counter()
+    created = seed(options)
+    print(
+        ', '.join(f'{name}: {count}' for name, count in created.items()),
+        f'({time.perf_counter() - started:.1f} s, '
+        f'{settings.DATABASES["default"]["NAME"]})'
+    )
+
+
+if __name__ == '__main__':
+    main()
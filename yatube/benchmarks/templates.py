@@ -0,0 +1,111 @@
+"""Цена отрисовки posts/index.html с cached.Loader и без него.
+
+Без кэширующего загрузчика каждая отрисовка заново читает и разбирает
+index.html, base.html, шапку, подвал и включения. Запуск из yatube/:
+
+    python -m benchmarks.templates --renders 500
+"""
+import argparse
+import json
+import statistics
+import time
+
+from benchmarks import environment
+
+
+def make_backend(cached):
+    from django.conf import settings
+    from django.template.backends.django import DjangoTemplates
+
+    options = dict(settings.TEMPLATES[0]['OPTIONS'])
+    options['loaders'] = settings.TEMPLATE_LOADERS
+    if cached:
+        options['loaders'] = [
+            ('django.template.loaders.cached.Loader', options['loaders'])
+        ]
+    return DjangoTemplates({
+        'NAME': 'cached' if cached else 'uncached',
+        'DIRS': settings.TEMPLATES[0]['DIRS'],
+        'APP_DIRS': False,
+        'OPTIONS': options,
+    })
+
+
+def make_context(posts):
+    """Страница ленты из несохранённых постов: БД не нужна."""
+    from django.contrib.auth import get_user_model
+    from django.contrib.auth.models import AnonymousUser
+    from django.core.paginator import Paginator
+    from django.test import RequestFactory
+    from django.utils import timezone
+
+    from posts.models import Group, Post
+
+    User = get_user_model()
+    group = Group(pk=1, title='Группа', slug='group')
+    page = Paginator(range(posts), posts).page(1)
+    page.object_list = [
+        Post(
+            pk=index,
+            text='Текст поста ' * 20,
+            pub_date=timezone.now(),
+            author=User(pk=index, username=f'user{index}'),
+            group=group if index % 2 else None,
+        )
+        for index in range(1, posts + 1)
+    ]
+    request = RequestFactory().get('/')
+    request.user = AnonymousUser()
+    # TTL 0: фрагментный кэш не сохраняет ленту и тело рисуется каждый раз
+    return request, {
+        'page_obj': page,
+        'feed_version': 0,
+        'feed_cache_ttl': 0,
+    }
+
+
+def measure(backend, renders, posts):
+    request, context = make_context(posts)
+    timings = []
+    for _ in range(renders):
+        started = time.perf_counter()
+        backend.get_template('posts/index.html').render(context, request)
+        timings.append(time.perf_counter() - started)
+    timings.sort()
+    return {
+        'p50_us': statistics.median(timings) * 1e6,
+        'p95_us': timings[int(len(timings) * 0.95)] * 1e6,
+        'mean_us': statistics.mean(timings) * 1e6,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--renders', type=int, default=500)
+    parser.add_argument('--posts', type=int, default=10)
+    parser.add_argument('--json', help='куда записать результаты')
+    options = vars(parser.parse_args())
+    environment.setup()
+    report = {}
+    for cached in (False, True):
+        backend = make_backend(cached)
+        # Первая отрисовка с кэшем - это и есть работа warm_templates
+        backend.get_template('posts/index.html')
+        report['cached' if cached else 'uncached'] = measure(
+            backend, options['renders'], options['posts']
+        )
+    for name, row in report.items():
+        print(
+            '{name:>8}: p50 {p50_us:8.1f} us, p95 {p95_us:8.1f} us, '
+            'mean {mean_us:8.1f} us'.format(name=name, **row)
+        )
+    saved = report['uncached']['mean_us'] - report['cached']['mean_us']
+    print(f'экономия на отрисовку: {saved:.1f} us')
+    if options['json']:
+        with open(options['json'], 'w') as output:
+            json.dump({'options': options, 'results': report}, output,
+                      indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,118 @@
+"""Пропускная способность записи при нескольких одновременных писателях.
+
+Потоки добавляют комментарии напрямую через ORM (каждый - своя
+транзакция) и через очередь core.db, которая пишет пачками из одного
+потока. --no-pragmas отключает SQLITE_PRAGMAS, чтобы сравнить с журналом
+по умолчанию. Сначала данные создаёт benchmarks.seed. Запуск из yatube/:
+
+    python -m benchmarks.writes --writers 8 --writes 2000
+"""
+import argparse
+import json
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks import environment
+from benchmarks.load import git_commit
+
+
+def add_comment(post_id, author_id):
+    from posts.models import Comment
+
+    Comment.objects.create(
+        post_id=post_id, author_id=author_id, text='Комментарий из бенчмарка'
+    )
+
+
+def measure(mode, options, post_id, author_id):
+    from django.db import OperationalError, connection
+
+    from core import db
+
+    errors = {'locked': 0, 'other': 0}
+    lock = threading.Lock()
+
+    def write(_):
+        try:
+            if mode == 'queue':
+                db.submit(add_comment, post_id, author_id).result()
+            else:
+                add_comment(post_id, author_id)
+        except OperationalError as error:
+            kind = 'locked' if 'locked' in str(error) else 'other'
+            with lock:
+                errors[kind] += 1
+        finally:
+            if mode == 'direct':
+                connection.close()
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(options['writers']) as executor:
+        list(executor.map(write, range(options['writes'])))
+    elapsed = time.perf_counter() - started
+    written = options['writes'] - sum(errors.values())
+    return {
+        'writes': written,
+        'locked_errors': errors['locked'],
+        'other_errors': errors['other'],
+        'seconds': round(elapsed, 3),
+        'writes_per_second': round(written / elapsed, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        '--data-dir', help='каталог данных вместо BENCH_DATA_DIR профиля bench'
+    )
+    parser.add_argument('--writers', type=int, default=8)
+    parser.add_argument('--writes', type=int, default=2000)
+    parser.add_argument(
+        '--no-pragmas', action='store_true',
+        help='не применять SQLITE_PRAGMAS (журнал rollback по умолчанию)'
+    )
+    parser.add_argument('--json', help='куда записать результаты')
+    options = vars(parser.parse_args())
+    environment.setup(options['data_dir'])
+    from django.conf import settings
+    from django.db import connection
+
+    from posts.models import Post
+
+    if options['no_pragmas']:
+        settings.SQLITE_PRAGMAS = {}
+        # Режим WAL хранится в самом файле базы
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA journal_mode = DELETE')
+    post = Post.objects.order_by('pk').only('pk', 'author_id').first()
+    if post is None:
+        sys.exit('Нет данных: сначала запустите python -m benchmarks.seed')
+    connection.close()
+    report = {
+        mode: measure(mode, options, post.pk, post.author_id)
+        for mode in ('direct', 'queue')
+    }
+    for mode, row in report.items():
+        print(
+            '{mode:>6}: {writes_per_second:8.1f} writes/s, '
+            '{locked_errors} database is locked, '
+            '{other_errors} других ошибок'.format(mode=mode, **row)
+        )
+    if options['json']:
+        with open(options['json'], 'w') as output:
+            json.dump(
+                {
+                    'commit': git_commit(),
+                    'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+                    'options': options,
+                    'results': report,
+                },
+                output,
+                indent=2,
+            )
+
+
+if __name__ == '__main__':
+    main()
@@ -1,5 +1,15 @@
 from django.apps import AppConfig
+from django.conf import settings
 
 
 class CoreConfig(AppConfig):
     name = 'core'
+
+    def ready(self):
+        from django.db.backends.signals import connection_created
+
+        from .db import configure_sqlite
+        connection_created.connect(configure_sqlite)
+        if 'core.middleware.MetricsMiddleware' in settings.MIDDLEWARE:
+            from . import metrics
+            metrics.instrument()
@@ -0,0 +1,226 @@
+import os
+import pickle
+import sqlite3
+import threading
+import time
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS cache (
+    key TEXT PRIMARY KEY,
+    value BLOB NOT NULL,
+    expires REAL,
+    accessed REAL NOT NULL
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS cache_accessed ON cache (accessed);
+"""
+
+
+class SQLiteCache(BaseCache):
+    """Общий для всех процессов кэш в файле SQLite.
+
+    В отличие от LocMemCache, воркеры gunicorn видят одни и те же
+    ключи. Запись атомарна (WAL, одна транзакция на операцию), при
+    переполнении вытесняются давно не читавшиеся ключи (LRU).
+
+    LOCATION - путь к файлу. OPTIONS: MAX_ENTRIES, CULL_FREQUENCY,
+    TOUCH_INTERVAL - как часто (в секундах) обновлять время чтения.
+    """
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self._path = location
+        self._touch_interval = float(options.get('TOUCH_INTERVAL', 60))
+        self._local = threading.local()
+
+    @property
+    def _connection(self):
+        local = self._local
+        if getattr(local, 'pid', None) != os.getpid():
+            directory = os.path.dirname(self._path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            connection = sqlite3.connect(
+                self._path, timeout=5, isolation_level=None
+            )
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            connection.execute('PRAGMA mmap_size=67108864')
+            connection.executescript(SCHEMA)
+            local.connection = connection
+            local.pid = os.getpid()
+        return local.connection
+
+    def _write(self, statements):
+        connection = self._connection
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            result = [connection.execute(*stmt) for stmt in statements]
+            connection.execute('COMMIT')
+        except BaseException:
+            connection.execute('ROLLBACK')
+            raise
+        return result
+
+    def _read(self, keys):
+        now = time.time()
+        found = {}
+        stale = []
+        touched = []
+        placeholders = ','.join('?' * len(keys))
+        rows = self._connection.execute(
+            f'SELECT key, value, expires, accessed FROM cache '
+            f'WHERE key IN ({placeholders})',
+            keys,
+        )
+        for key, value, expires, accessed in rows:
+            if expires is not None and expires <= now:
+                stale.append((key,))
+                continue
+            found[key] = pickle.loads(value)
+            if now - accessed > self._touch_interval:
+                touched.append((now, key))
+        if stale or touched:
+            self._write(
+                [('DELETE FROM cache WHERE key = ?', key) for key in stale]
+                + [
+                    ('UPDATE cache SET accessed = ? WHERE key = ?', params)
+                    for params in touched
+                ]
+            )
+        return found
+
+    def _cull(self):
+        connection = self._connection
+        count, = connection.execute('SELECT COUNT(*) FROM cache').fetchone()
+        if count <= self._max_entries:
+            return []
+        return [
+            ('DELETE FROM cache WHERE expires <= ?', (time.time(),)),
+            (
+                'DELETE FROM cache WHERE key IN ('
+                'SELECT key FROM cache ORDER BY accessed LIMIT ?)',
+                (count // self._cull_frequency if self._cull_frequency
+                 else count,),
+            ),
+        ]
+
+    def get(self, key, default=None, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        return self._read([key]).get(key, default)
+
+    def get_many(self, keys, version=None):
+        made = {self.make_key(key, version=version): key for key in keys}
+        for key in made:
+            self.validate_key(key)
+        if not made:
+            return {}
+        found = self._read(list(made))
+        return {made[key]: value for key, value in found.items()}
+
+    def _set_statement(self, key, value, timeout, verb='REPLACE'):
+        return (
+            f'INSERT OR {verb} INTO cache (key, value, expires, accessed) '
+            'VALUES (?, ?, ?, ?)',
+            (
+                key,
+                pickle.dumps(value, pickle.HIGHEST_PROTOCOL),
+                self.get_backend_timeout(timeout),
+                time.time(),
+            ),
+        )
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        self._write(
+            [self._set_statement(key, value, timeout)] + self._cull()
+        )
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        statements = []
+        for key, value in data.items():
+            key = self.make_key(key, version=version)
+            self.validate_key(key)
+            statements.append(self._set_statement(key, value, timeout))
+        if statements:
+            self._write(statements + self._cull())
+        return []
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        cursor, = self._write([
+            ('DELETE FROM cache WHERE key = ? AND expires <= ?',
+             (key, time.time())),
+            self._set_statement(key, value, timeout, verb='IGNORE'),
+        ])[1:]
+        return cursor.rowcount == 1
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        cursor, = self._write([(
+            'UPDATE cache SET expires = ? WHERE key = ? '
+            'AND (expires IS NULL OR expires > ?)',
+            (self.get_backend_timeout(timeout), key, time.time()),
+        )])
+        return cursor.rowcount == 1
+
+    def incr(self, key, delta=1, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        connection = self._connection
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            row = connection.execute(
+                'SELECT value FROM cache WHERE key = ? '
+                'AND (expires IS NULL OR expires > ?)',
+                (key, time.time()),
+            ).fetchone()
+            if row is None:
+                raise ValueError("Key '%s' not found" % key)
+            value = pickle.loads(row[0]) + delta
+            connection.execute(
+                'UPDATE cache SET value = ? WHERE key = ?',
+                (pickle.dumps(value, pickle.HIGHEST_PROTOCOL), key),
+            )
+            connection.execute('COMMIT')
+        except BaseException:
+            connection.execute('ROLLBACK')
+            raise
+        return value
+
+    def has_key(self, key, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        return self._connection.execute(
+            'SELECT 1 FROM cache WHERE key = ? '
+            'AND (expires IS NULL OR expires > ?)',
+            (key, time.time()),
+        ).fetchone() is not None
+
+    def delete(self, key, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        self._write([('DELETE FROM cache WHERE key = ?', (key,))])
+
+    def delete_many(self, keys, version=None):
+        statements = []
+        for key in keys:
+            key = self.make_key(key, version=version)
+            self.validate_key(key)
+            statements.append(('DELETE FROM cache WHERE key = ?', (key,)))
+        if statements:
+            self._write(statements)
+
+    def clear(self):
+        self._write([('DELETE FROM cache',)])
+
+    def close(self, **kwargs):
+        # Соединение живёт весь срок жизни потока: открывать файл
+        # на каждый запрос дороже, чем держать его открытым.
+        pass
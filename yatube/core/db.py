@@ -0,0 +1,133 @@
+"""Настройка соединений SQLite и очередь мелких записей.
+
+SQLite допускает одного писателя на файл. Конкурирующие транзакции
+воркера ждут друг друга на busy_timeout или падают с "database is
+locked"; очередь вместо этого собирает записи в одну короткую
+транзакцию, которую пишет единственный поток.
+"""
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+from django.conf import settings
+from django.db import connection, transaction
+
+logger = logging.getLogger(__name__)
+
+
+def configure_sqlite(sender, connection, **kwargs):
+    """Обработчик connection_created: применяет SQLITE_PRAGMAS."""
+    if connection.vendor != 'sqlite':
+        return
+    for name, value in settings.SQLITE_PRAGMAS.items():
+        connection.connection.execute(f'PRAGMA {name} = {value}')
+
+
+class WriteQueue:
+    """Поток, выполняющий записи пачками в одной транзакции.
+
+    Каждая запись идёт в своей точке сохранения, поэтому ошибка одной
+    не откатывает соседние, а попадает в её Future.
+    """
+
+    def __init__(self, batch_size, linger):
+        self.batch_size = batch_size
+        self.linger = linger
+        self._queue = queue.SimpleQueue()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def submit(self, func, *args, **kwargs):
+        """Ставит func(*args, **kwargs) в очередь и возвращает Future.
+
+        Внутри уже открытой транзакции (в т.ч. в тестах) запись
+        выполняется сразу: она должна стать её частью.
+        """
+        if connection.in_atomic_block:
+            future = Future()
+            self._call(future, func, args, kwargs)
+            return future
+        self._ensure_thread()
+        future = Future()
+        self._queue.put((future, func, args, kwargs))
+        return future
+
+    def _ensure_thread(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(
+                    target=self._run, name='write-queue', daemon=True
+                )
+                self._thread.start()
+
+    def _call(self, future, func, args, kwargs):
+        if not future.set_running_or_notify_cancel():
+            return
+        try:
+            with transaction.atomic():
+                result = func(*args, **kwargs)
+        except Exception as error:
+            future.set_exception(error)
+        else:
+            future.set_result(result)
+
+    def _drain(self):
+        """Первая запись ждётся без срока, следующие - не дольше linger."""
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.linger
+        while len(batch) < self.batch_size:
+            timeout = deadline - time.monotonic()
+            try:
+                if timeout > 0:
+                    batch.append(self._queue.get(timeout=timeout))
+                else:
+                    batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _write(self, batch):
+        """Выполняет пачку; результаты отдаются только после COMMIT."""
+        outcomes = []
+        with transaction.atomic():
+            for future, func, args, kwargs in batch:
+                if not future.set_running_or_notify_cancel():
+                    continue
+                try:
+                    with transaction.atomic():
+                        outcomes.append((future, func(*args, **kwargs), None))
+                except Exception as error:
+                    outcomes.append((future, None, error))
+        return outcomes
+
+    def _run(self):
+        while True:
+            batch = self._drain()
+            try:
+                outcomes = self._write(batch)
+            except Exception as error:
+                logger.exception(
+                    'Пачка из %d записей не сохранена', len(batch)
+                )
+                outcomes = [
+                    (future, None, error) for future, *_ in batch
+                    if future.running()
+                ]
+            finally:
+                connection.close_if_unusable_or_obsolete()
+            for future, result, error in outcomes:
+                if error is None:
+                    future.set_result(result)
+                else:
+                    future.set_exception(error)
+
+
+write_queue = WriteQueue(
+    settings.WRITE_QUEUE_BATCH, settings.WRITE_QUEUE_LINGER
+)
+
+
+def submit(func, *args, **kwargs):
+    return write_queue.submit(func, *args, **kwargs)
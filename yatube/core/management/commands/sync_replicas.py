@@ -0,0 +1,25 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from core import replicas
+
+
+class Command(BaseCommand):
+    help = 'Копирует основную SQLite-базу в реплики DATABASE_REPLICAS'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'aliases', nargs='*',
+            help='какие реплики обновить; по умолчанию все'
+        )
+
+    def handle(self, *args, **options):
+        aliases = options['aliases'] or settings.DATABASE_REPLICAS
+        unknown = set(aliases) - set(settings.DATABASE_REPLICAS)
+        if unknown:
+            raise CommandError(f'Нет таких реплик: {", ".join(unknown)}')
+        for alias in aliases:
+            replicas.sync(alias)
+            self.stdout.write(
+                f'{alias}: {settings.DATABASES[alias]["NAME"]} обновлена'
+            )
@@ -0,0 +1,236 @@
+"""Метрики запросов в памяти процесса и их выдача в формате Prometheus.
+
+Каждый воркер копит свои гистограммы; Prometheus собирает их с каждого
+процесса отдельно и суммирует сам.
+"""
+import threading
+from bisect import bisect_left
+from functools import wraps
+from time import perf_counter
+
+from django.conf import settings
+from django.core.cache import caches
+from django.template.backends.django import Template
+
+DURATION_BUCKETS = (
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10
+)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100, 200)
+
+_MISSING = object()
+_state = threading.local()
+
+
+class Histogram:
+    """Гистограмма Prometheus с меткой view."""
+
+    def __init__(self, name, documentation, buckets):
+        self.name = name
+        self.documentation = documentation
+        self.buckets = buckets
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, view, value):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(view)
+            if series is None:
+                series = self._series[view] = [
+                    [0] * (len(self.buckets) + 1), 0, 0
+                ]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def collect(self):
+        with self._lock:
+            series = {
+                view: (list(counts), total, count)
+                for view, (counts, total, count) in self._series.items()
+            }
+        yield f'# HELP {self.name} {self.documentation}'
+        yield f'# TYPE {self.name} histogram'
+        for view, (counts, total, count) in sorted(series.items()):
+            label = f'view="{_escape(view)}"'
+            cumulative = 0
+            for bound, bucket in zip(self.buckets + ('+Inf',), counts):
+                cumulative += bucket
+                yield (
+                    f'{self.name}_bucket{{{label},le="{bound}"}} {cumulative}'
+                )
+            yield f'{self.name}_sum{{{label}}} {total}'
+            yield f'{self.name}_count{{{label}}} {count}'
+
+    def clear(self):
+        with self._lock:
+            self._series.clear()
+
+
+class Counter:
+    """Счётчик Prometheus с меткой view."""
+
+    def __init__(self, name, documentation):
+        self.name = name
+        self.documentation = documentation
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, view, amount):
+        if amount:
+            with self._lock:
+                self._values[view] = self._values.get(view, 0) + amount
+
+    def collect(self):
+        with self._lock:
+            values = dict(self._values)
+        yield f'# HELP {self.name} {self.documentation}'
+        yield f'# TYPE {self.name} counter'
+        for view, value in sorted(values.items()):
+            yield f'{self.name}{{view="{_escape(view)}"}} {value}'
+
+    def clear(self):
+        with self._lock:
+            self._values.clear()
+
+
+def _escape(value):
+    return value.replace('\\', r'\\').replace('"', r'\"')
+
+
+REQUEST_SECONDS = Histogram(
+    'yatube_request_duration_seconds',
+    'Полное время обработки запроса.',
+    DURATION_BUCKETS
+)
+SQL_QUERIES = Histogram(
+    'yatube_sql_queries',
+    'Число SQL-запросов за запрос.',
+    QUERY_BUCKETS
+)
+SQL_SECONDS = Histogram(
+    'yatube_sql_duration_seconds',
+    'Время выполнения SQL за запрос.',
+    DURATION_BUCKETS
+)
+TEMPLATE_SECONDS = Histogram(
+    'yatube_template_duration_seconds',
+    'Время отрисовки шаблонов за запрос.',
+    DURATION_BUCKETS
+)
+CACHE_HITS = Counter('yatube_cache_hits_total', 'Попадания в кэш.')
+CACHE_MISSES = Counter('yatube_cache_misses_total', 'Промахи кэша.')
+
+REGISTRY = (
+    REQUEST_SECONDS, SQL_QUERIES, SQL_SECONDS, TEMPLATE_SECONDS,
+    CACHE_HITS, CACHE_MISSES,
+)
+
+
+class Sample:
+    """Замеры одного запроса."""
+
+    __slots__ = (
+        'started', 'sql_count', 'sql_time', 'template_time',
+        'cache_hits', 'cache_misses',
+    )
+
+    def __init__(self):
+        self.started = perf_counter()
+        self.sql_count = 0
+        self.sql_time = 0.0
+        self.template_time = 0.0
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+    def execute_wrapper(self, execute, sql, params, many, context):
+        started = perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.sql_time += perf_counter() - started
+            self.sql_count += 1
+
+
+def start():
+    _state.sample = sample = Sample()
+    return sample
+
+
+def finish(sample, view):
+    """Переносит замеры запроса в гистограммы вида view."""
+    _state.sample = None
+    REQUEST_SECONDS.observe(view, perf_counter() - sample.started)
+    SQL_QUERIES.observe(view, sample.sql_count)
+    SQL_SECONDS.observe(view, sample.sql_time)
+    TEMPLATE_SECONDS.observe(view, sample.template_time)
+    CACHE_HITS.inc(view, sample.cache_hits)
+    CACHE_MISSES.inc(view, sample.cache_misses)
+
+
+def export():
+    """Все метрики процесса в текстовом формате Prometheus."""
+    return '\n'.join(
+        line for metric in REGISTRY for line in metric.collect()
+    ) + '\n'
+
+
+def reset():
+    for metric in REGISTRY:
+        metric.clear()
+
+
+def _timed_render(render):
+    @wraps(render)
+    def wrapper(self, *args, **kwargs):
+        sample = getattr(_state, 'sample', None)
+        if sample is None:
+            return render(self, *args, **kwargs)
+        started = perf_counter()
+        try:
+            return render(self, *args, **kwargs)
+        finally:
+            sample.template_time += perf_counter() - started
+    return wrapper
+
+
+def _counted_get(get):
+    @wraps(get)
+    def wrapper(self, key, default=None, version=None):
+        value = get(self, key, _MISSING, version)
+        sample = getattr(_state, 'sample', None)
+        if value is _MISSING:
+            if sample is not None:
+                sample.cache_misses += 1
+            return default
+        if sample is not None:
+            sample.cache_hits += 1
+        return value
+    return wrapper
+
+
+def _counted_get_many(get_many):
+    @wraps(get_many)
+    def wrapper(self, keys, version=None):
+        keys = list(keys)
+        values = get_many(self, keys, version)
+        sample = getattr(_state, 'sample', None)
+        if sample is not None:
+            sample.cache_hits += len(values)
+            sample.cache_misses += len(keys) - len(values)
+        return values
+    return wrapper
+
+
+def instrument():
+    """Подключает замеры шаблонов и кэша; вызывается один раз из ready()."""
+    if getattr(Template.render, '_metrics', False):
+        return
+    Template.render = _timed_render(Template.render)
+    Template.render._metrics = True
+    # get_many из BaseCache сам вызывает get, его оборачивать не нужно
+    for backend in {type(caches[alias]) for alias in settings.CACHES}:
+        if 'get' in vars(backend):
+            backend.get = _counted_get(backend.get)
+        if 'get_many' in vars(backend):
+            backend.get_many = _counted_get_many(backend.get_many)
@@ -0,0 +1,24 @@
+from contextlib import ExitStack
+
+from django.db import connections
+
+from . import metrics
+
+
+class MetricsMiddleware:
+    """Собирает время, SQL, шаблоны и кэш каждого запроса по имени вида."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        sample = metrics.start()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(
+                    connection.execute_wrapper(sample.execute_wrapper)
+                )
+            response = self.get_response(request)
+        match = request.resolver_match
+        metrics.finish(sample, match.view_name if match else 'unresolved')
+        return response
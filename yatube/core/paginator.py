@@ -0,0 +1,184 @@
+import base64
+import binascii
+import json
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.paginator import Paginator
+from django.db.models import AutoField, Max, Min, Q
+from django.utils.functional import cached_property
+
+
+class InvalidCursor(Exception):
+    pass
+
+
+class EstimatedCountPaginator(Paginator):
+    """Paginator админки, который не делает COUNT(*) по большим таблицам.
+
+    Для выборки без фильтров число строк оценивается по размаху
+    автоинкрементного ключа: два поиска по индексу вместо обхода
+    таблицы. Удалённые строки завышают оценку, поэтому последние
+    страницы могут оказаться короче. Таблицы меньше
+    ADMIN_EXACT_COUNT_LIMIT и выборки с фильтрами считаются точно.
+    """
+
+    @cached_property
+    def count(self):
+        estimate = self.estimate()
+        if estimate is None or estimate < settings.ADMIN_EXACT_COUNT_LIMIT:
+            return super().count
+        return estimate
+
+    def estimate(self):
+        queryset = self.object_list
+        query = getattr(queryset, 'query', None)
+        if query is None or query.where or query.distinct:
+            return None
+        if not isinstance(queryset.model._meta.pk, AutoField):
+            return None
+        rows = queryset.model._base_manager.using(queryset.db)
+        # SQLite берёт MIN и MAX из индекса, только если они одни в запросе
+        high = rows.aggregate(high=Max('pk'))['high']
+        if high is None:
+            return 0
+        return high - rows.aggregate(low=Min('pk'))['low'] + 1
+
+
+class CursorPaginator(Paginator):
+    """Постраничный вывод по ключу сортировки (keyset) вместо OFFSET.
+
+    Позиция страницы передаётся непрозрачным токеном ``?cursor=``,
+    поэтому страница 5000 стоит столько же, сколько первая, а
+    ``COUNT(*)`` выполняется только при обращении к ``count``.
+    Последнее поле ``ordering`` должно быть уникальным; внешние ключи
+    указываются как ``post_id``, иначе сортировка уйдёт в связанную модель.
+    """
+
+    def __init__(self, object_list, per_page, ordering=('-pub_date', '-pk'),
+                 total=None, **kwargs):
+        super().__init__(object_list, per_page, **kwargs)
+        self.ordering = tuple(ordering)
+        self.total = total
+
+    def _check_object_list_is_ordered(self):
+        # Порядок всегда задаёт self.ordering
+        pass
+
+    @cached_property
+    def count(self):
+        """Приблизительный итог, если он передан, иначе точный COUNT."""
+        if self.total is not None:
+            return self.total
+        return super().count
+
+    @cached_property
+    def fields(self):
+        opts = self.object_list.model._meta
+        by_name = {'pk': opts.pk}
+        for field in opts.concrete_fields:
+            by_name[field.name] = by_name[field.attname] = field
+        return [
+            (name.lstrip('-'), name.startswith('-'), by_name[name.lstrip('-')])
+            for name in self.ordering
+        ]
+
+    def encode_cursor(self, obj, number, forward):
+        values = [
+            field.value_to_string(obj) for _, _, field in self.fields
+        ]
+        payload = json.dumps([values, number, forward], separators=(',', ':'))
+        return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+    def decode_cursor(self, cursor):
+        try:
+            padded = cursor + '=' * (-len(cursor) % 4)
+            values, number, forward = json.loads(
+                base64.urlsafe_b64decode(padded.encode())
+            )
+            if (
+                type(values) is not list
+                or len(values) != len(self.fields)
+                or type(number) is not int
+                # None дал бы в фильтре pub_date__lt=None и ошибку 500
+                or not all(type(value) is str for value in values)
+            ):
+                raise InvalidCursor(cursor)
+            values = [
+                field.to_python(value)
+                for (_, _, field), value in zip(self.fields, values)
+            ]
+            if None in values:
+                raise InvalidCursor(cursor)
+        except (binascii.Error, TypeError, ValueError, ValidationError):
+            raise InvalidCursor(cursor)
+        return values, max(number, 1), bool(forward)
+
+    def get_cursor_page(self, cursor=None, number=None):
+        """Страница по токену курсора или, для старых ссылок, по номеру."""
+        if cursor:
+            try:
+                return self._page_after(*self.decode_cursor(cursor))
+            except InvalidCursor:
+                pass
+        try:
+            number = max(int(number), 1)
+        except (TypeError, ValueError):
+            number = 1
+        return self._page_at(number)
+
+    def _ordered(self, forward):
+        if forward:
+            return self.object_list.order_by(*self.ordering)
+        return self.object_list.order_by(*(
+            name[1:] if name.startswith('-') else f'-{name}'
+            for name in self.ordering
+        ))
+
+    def _after(self, values, forward):
+        condition = Q()
+        equal = {}
+        for (name, descending, _), value in zip(self.fields, values):
+            lookup = 'lt' if descending == forward else 'gt'
+            condition |= Q(**equal, **{f'{name}__{lookup}': value})
+            equal[name] = value
+        return condition
+
+    def _page_at(self, number):
+        bottom = (number - 1) * self.per_page
+        rows = list(self._ordered(True)[bottom:bottom + self.per_page + 1])
+        return self._build_page(
+            rows[:self.per_page],
+            number,
+            has_previous=number > 1,
+            has_next=len(rows) > self.per_page,
+        )
+
+    def _page_after(self, values, number, forward):
+        queryset = self._ordered(forward).filter(self._after(values, forward))
+        rows = list(queryset[:self.per_page + 1])
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if forward:
+            return self._build_page(
+                rows, number, has_previous=True, has_next=has_more
+            )
+        rows.reverse()
+        return self._build_page(
+            rows,
+            number if has_more else 1,
+            has_previous=has_more,
+            has_next=True,
+        )
+
+    def _build_page(self, rows, number, has_previous, has_next):
+        page = self._get_page(rows, number, self)
+        page.next_cursor = None
+        page.previous_cursor = None
+        if rows and has_next:
+            page.next_cursor = self.encode_cursor(rows[-1], number + 1, True)
+        if rows and has_previous:
+            page.previous_cursor = self.encode_cursor(
+                rows[0], number - 1, False
+            )
+        return page
@@ -0,0 +1,143 @@
+"""Поиск N+1 и медленных SQL-запросов по отпечаткам выражений.
+
+Django передаёт в execute_wrapper SQL с плейсхолдерами отдельно от
+параметров, поэтому одинаковый отпечаток с разными параметрами внутри
+одного запроса почти всегда означает обращение к связи в цикле.
+"""
+import logging
+import re
+from contextlib import ExitStack
+from time import perf_counter
+
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+_IN_LIST = re.compile(r'\(\s*%s(?:\s*,\s*%s)*\s*\)')
+_LITERAL = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+_SPACES = re.compile(r'\s+')
+# Управление транзакцией, а не обращение к данным
+_SAVEPOINT = re.compile(r'\s*(?:RELEASE |ROLLBACK TO )?SAVEPOINT\b')
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+def fingerprint(sql):
+    """SQL без значений: списки IN, числа и строки сворачиваются."""
+    sql = _IN_LIST.sub('(...)', sql)
+    sql = _LITERAL.sub('?', sql)
+    return _SPACES.sub(' ', sql).strip()
+
+
+def query_budget(limit):
+    """Объявляет, сколько SQL-запросов может выполнить вид."""
+    def decorator(view):
+        view.query_budget = limit
+        return view
+    return decorator
+
+
+class QueryWatcher:
+    """Собирает SQL всех подключений внутри блока with."""
+
+    def __init__(self):
+        self.count = 0
+        self.statements = {}
+        self.slow = []
+        self._ignored = tuple(
+            f'"{table}"' for table in settings.QUERY_WATCH_IGNORE_TABLES
+        )
+        self._stack = None
+
+    def __enter__(self):
+        self._stack = ExitStack()
+        for connection in connections.all():
+            self._stack.enter_context(connection.execute_wrapper(self))
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stack.close()
+
+    def __call__(self, execute, sql, params, many, context):
+        started = perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = perf_counter() - started
+            if not self._skipped(sql):
+                self._record(sql, params, duration)
+
+    def _skipped(self, sql):
+        return _SAVEPOINT.match(sql) or any(
+            table in sql for table in self._ignored
+        )
+
+    def _record(self, sql, params, duration):
+        self.count += 1
+        self.statements.setdefault(fingerprint(sql), []).append(params)
+        if duration >= settings.QUERY_SLOW_THRESHOLD:
+            self.slow.append((duration, sql))
+
+    def repeated(self):
+        """Отпечатки, выполненные с разными параметрами не меньше порога."""
+        threshold = settings.QUERY_REPEAT_THRESHOLD
+        return {
+            sql: len(params)
+            for sql, params in self.statements.items()
+            if len(params) >= threshold
+            and len({repr(value) for value in params}) > 1
+        }
+
+    def problems(self, budget=None):
+        """Превышение бюджета и N+1 — то, на чём падают тесты."""
+        found = []
+        if budget is not None and self.count > budget:
+            found.append(
+                f'выполнено {self.count} запросов при бюджете {budget}'
+            )
+        found.extend(
+            f'N+1: {times} раз {sql}'
+            for sql, times in self.repeated().items()
+        )
+        return found
+
+
+class QueryWatchMiddleware:
+    """Проверяет SQL каждого запроса.
+
+    QUERY_WATCH = 'log' пишет предупреждения, 'strict' роняет запрос,
+    если вид с объявленным query_budget вышел за бюджет или сделал N+1.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        mode = settings.QUERY_WATCH
+        if not mode:
+            return self.get_response(request)
+        request.query_budget = None
+        with QueryWatcher() as watcher:
+            response = self.get_response(request)
+        budget = request.query_budget
+        problems = watcher.problems(budget)
+        if not problems and not watcher.slow:
+            return response
+        match = request.resolver_match
+        view = match.view_name if match else request.path
+        # Время запросов на CI нестабильно, поэтому медленные только в лог
+        for duration, sql in watcher.slow:
+            logger.warning(
+                '%s: медленный запрос %.3f с: %s', view, duration, sql
+            )
+        if problems and mode == 'strict' and budget is not None:
+            raise QueryBudgetExceeded(f'{view}: ' + '\n'.join(problems))
+        for problem in problems:
+            logger.warning('%s: %s', view, problem)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request.query_budget = getattr(view_func, 'query_budget', None)
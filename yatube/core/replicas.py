@@ -0,0 +1,107 @@
+"""Чтение лент с реплик и запись в основную базу.
+
+Вид с read_replica читает модели приложений REPLICA_APPS с одной из
+DATABASE_REPLICAS; пользователи, сессии и прочее всегда читаются из
+основной базы. После записи клиент получает куку и REPLICA_PIN_SECONDS
+читает только основную базу, чтобы видеть свои изменения, пока реплики
+не догнали её. Отрисованное с реплики кэшируется лишь на
+REPLICA_CACHE_TTL: версия ленты уже новая, а данные могут отставать.
+"""
+import random
+import sqlite3
+import threading
+import time
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+_state = threading.local()
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS', 'TRACE')
+
+
+def read_replica(view):
+    """Вид можно отдавать с реплики."""
+    view.database_hint = 'replica'
+    return view
+
+
+def write_primary(view):
+    """Вид пишет в базу, даже если вызван GET-запросом."""
+    view.database_hint = 'primary'
+    return view
+
+
+def current_replica():
+    return getattr(_state, 'replica', None)
+
+
+def sync(alias):
+    """Копирует основную SQLite-базу в реплику через backup API.
+
+    Копирование идёт постранично и не блокирует запись надолго;
+    читатели реплики видят новые данные после его окончания.
+    """
+    primary = connections[DEFAULT_DB_ALIAS]
+    primary.ensure_connection()
+    target = sqlite3.connect(settings.DATABASES[alias]['NAME'])
+    try:
+        primary.connection.backup(target, pages=1024)
+    finally:
+        target.close()
+
+
+class ReplicaRouter:
+    """Чтения лент внутри вида с read_replica идут на выбранную реплику."""
+
+    def db_for_read(self, model, **hints):
+        if model._meta.app_label in settings.REPLICA_APPS:
+            return current_replica()
+        return None
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # На репликах те же строки, что и в основной базе
+        return True
+
+    def allow_migrate(self, db, app_label, **hints):
+        return db not in settings.DATABASE_REPLICAS
+
+
+class ReplicaMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        request.database_hint = None
+        try:
+            response = self.get_response(request)
+        finally:
+            _state.replica = None
+        if (request.method not in SAFE_METHODS
+                or request.database_hint == 'primary'):
+            pin_until = int(time.time()) + settings.REPLICA_PIN_SECONDS
+            response.set_cookie(
+                settings.REPLICA_PIN_COOKIE,
+                str(pin_until),
+                max_age=settings.REPLICA_PIN_SECONDS,
+                httponly=True,
+            )
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request.database_hint = getattr(view_func, 'database_hint', None)
+        if (request.database_hint == 'replica'
+                and settings.DATABASE_REPLICAS
+                and not self.pinned(request)):
+            _state.replica = random.choice(settings.DATABASE_REPLICAS)
+
+    @staticmethod
+    def pinned(request):
+        try:
+            pin_until = float(request.COOKIES[settings.REPLICA_PIN_COOKIE])
+        except (KeyError, ValueError):
+            return False
+        return pin_until > time.time()
@@ -0,0 +1,14 @@
+from django.conf import settings
+from django.test.runner import DiscoverRunner
+
+
+class QueryWatchRunner(DiscoverRunner):
+    """Тесты падают, если вид вышел за query_budget или сделал N+1."""
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        settings.QUERY_WATCH = 'strict'
+        # В тестах реплики - зеркала тестовой базы, маршрутизация не нужна
+        settings.DATABASE_REPLICAS = []
+        # Фоновые потоки миниатюр переживают тест и мешают его очистке
+        settings.THUMBNAIL_WORKERS = 0
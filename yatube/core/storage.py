@@ -0,0 +1,45 @@
+import hashlib
+import os
+import posixpath
+
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+
+
+def file_digest(content):
+    """SHA-256 содержимого; загрузчик считает его заранее, пока пишет."""
+    digest = getattr(content, 'sha256', None)
+    if digest:
+        return digest
+    sha256 = hashlib.sha256()
+    for chunk in content.chunks():
+        sha256.update(chunk)
+    content.sha256 = sha256.hexdigest()
+    return content.sha256
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """Хранилище, где имя файла - хэш содержимого.
+
+    Файл ляжет в <каталог upload_to>/ab/abcdef...<расширение>. Одинаковое
+    содержимое получает то же имя, поэтому второй раз не пишется, а
+    sorl-thumbnail находит для него уже готовые миниатюры. Файлы общие,
+    удалять их можно только когда на них никто не ссылается, а ссылку
+    на уже лежащий файл нужно взять до save(): иначе файл могут удалить
+    между проверкой exists() и записью ссылки.
+    """
+
+    def content_name(self, name, content):
+        """Имя, под которым save() сохранит content."""
+        digest = file_digest(content)
+        directory, filename = posixpath.split(name.replace('\\', '/'))
+        extension = os.path.splitext(filename)[1].lower()
+        return posixpath.join(directory, digest[:2], digest + extension)
+
+    def save(self, name, content, max_length=None):
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+        name = self.content_name(name, content)
+        if self.exists(name):
+            return name
+        return super().save(name, content, max_length)
@@ -0,0 +1,71 @@
+import multiprocessing
+import os
+import shutil
+import tempfile
+import time
+
+from django.test import SimpleTestCase
+
+from core.cache import SQLiteCache
+
+
+def _write_from_child(path):
+    SQLiteCache(path, {}).set('from_child', 'значение')
+
+
+class SQLiteCacheTests(SimpleTestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'cache.sqlite3')
+        self.cache = SQLiteCache(self.path, {'OPTIONS': {'MAX_ENTRIES': 10}})
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def test_set_get_delete(self):
+        """Значения сохраняются, читаются и удаляются."""
+        self.cache.set('key', {'posts': [1, 2]})
+        self.assertEqual(self.cache.get('key'), {'posts': [1, 2]})
+        self.assertTrue(self.cache.has_key('key'))
+        self.cache.delete('key')
+        self.assertIsNone(self.cache.get('key'))
+
+    def test_many_add_incr(self):
+        """get_many, add и incr работают как в остальных бэкендах."""
+        self.cache.set_many({'a': 1, 'b': 2})
+        self.assertEqual(self.cache.get_many(['a', 'b', 'c']),
+                         {'a': 1, 'b': 2})
+        self.assertFalse(self.cache.add('a', 10))
+        self.assertTrue(self.cache.add('c', 3))
+        self.assertEqual(self.cache.incr('a', 5), 6)
+        with self.assertRaises(ValueError):
+            self.cache.incr('missing')
+
+    def test_expired_key_is_missing(self):
+        """Просроченный ключ не возвращается."""
+        self.cache.set('key', 'value', timeout=0.01)
+        time.sleep(0.02)
+        self.assertIsNone(self.cache.get('key'))
+        self.assertTrue(self.cache.add('key', 'new'))
+
+    def test_least_recently_used_are_culled(self):
+        """При переполнении вытесняются давно не читавшиеся ключи."""
+        cache = SQLiteCache(self.path, {
+            'OPTIONS': {'MAX_ENTRIES': 4, 'TOUCH_INTERVAL': 0}
+        })
+        for i in range(5):
+            cache.set(f'key_{i}', i)
+            time.sleep(0.001)
+        cache.get('key_0')
+        cache.set('key_5', 5)
+        self.assertEqual(cache.get('key_0'), 0)
+        self.assertIsNone(cache.get('key_1'))
+
+    def test_shared_between_processes(self):
+        """Ключ, записанный другим процессом, виден в этом."""
+        process = multiprocessing.get_context('spawn').Process(
+            target=_write_from_child, args=(self.path,)
+        )
+        process.start()
+        process.join()
+        self.assertEqual(self.cache.get('from_child'), 'значение')
@@ -0,0 +1,58 @@
+from concurrent.futures import Future
+
+from django.db import IntegrityError, connection
+from django.test import TestCase
+
+from core.db import WriteQueue
+from posts.models import Group
+
+
+def make_group(slug):
+    return Group.objects.create(title=slug, slug=slug, description='')
+
+
+class SqlitePragmasTests(TestCase):
+    def pragma(self, name):
+        with connection.cursor() as cursor:
+            cursor.execute(f'PRAGMA {name}')
+            return cursor.fetchone()[0]
+
+    def test_pragmas_applied(self):
+        """Новое подключение получает настройки из SQLITE_PRAGMAS."""
+        self.assertEqual(self.pragma('synchronous'), 1)
+        self.assertEqual(self.pragma('busy_timeout'), 5000)
+        self.assertEqual(self.pragma('cache_size'), -64000)
+
+
+class WriteQueueTests(TestCase):
+    def setUp(self):
+        self.queue = WriteQueue(batch_size=3, linger=0)
+
+    def test_inline_inside_transaction(self):
+        """В открытой транзакции запись выполняется сразу, без потока."""
+        future = self.queue.submit(make_group, 'inline')
+        self.assertEqual(future.result(timeout=0).slug, 'inline')
+        self.assertIsNone(self.queue._thread)
+
+    def test_drain_limited_by_batch_size(self):
+        """Пачка не больше batch_size, остальное ждёт следующей."""
+        for index in range(5):
+            self.queue._queue.put((Future(), make_group, (f'g{index}',), {}))
+        self.assertEqual(len(self.queue._drain()), 3)
+        self.assertEqual(len(self.queue._drain()), 2)
+
+    def test_failed_write_does_not_roll_back_batch(self):
+        """Ошибка одной записи попадает в её Future, соседние сохраняются."""
+        batch = [
+            (Future(), make_group, (slug,), {})
+            for slug in ('first', 'first', 'second')
+        ]
+        outcomes = self.queue._write(batch)
+        errors = [error for _, _, error in outcomes]
+        self.assertIsNone(errors[0])
+        self.assertIsInstance(errors[1], IntegrityError)
+        self.assertIsNone(errors[2])
+        self.assertEqual(
+            set(Group.objects.values_list('slug', flat=True)),
+            {'first', 'second'}
+        )
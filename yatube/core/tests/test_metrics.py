@@ -0,0 +1,68 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase
+
+from core import metrics
+from posts.models import Post
+
+User = get_user_model()
+
+
+class MetricsMiddlewareTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='writer')
+        Post.objects.create(author=cls.author, text='Пост для метрик')
+        cls.staff = User.objects.create_user(username='admin', is_staff=True)
+
+    def setUp(self):
+        cache.clear()
+        metrics.reset()
+
+    def series(self, metric, view):
+        return metric._series[view]
+
+    def test_request_is_measured_by_view_name(self):
+        """Запрос попадает в гистограммы под именем вида."""
+        self.client.get('/')
+        self.client.get('/')
+        counts, sql_total, requests = self.series(
+            metrics.SQL_QUERIES, 'posts:index'
+        )
+        self.assertEqual(requests, 2)
+        self.assertGreater(sql_total, 0)
+        self.assertEqual(
+            self.series(metrics.REQUEST_SECONDS, 'posts:index')[2], 2
+        )
+        self.assertGreater(
+            self.series(metrics.TEMPLATE_SECONDS, 'posts:index')[1], 0
+        )
+        # Второй запрос берёт ленту из кэша фрагментов
+        self.assertGreater(metrics.CACHE_HITS._values['posts:index'], 0)
+        self.assertGreater(metrics.CACHE_MISSES._values['posts:index'], 0)
+
+    def test_unresolved_requests_are_grouped(self):
+        """Запросы к несуществующим адресам не плодят метки."""
+        self.client.get('/unexisting_page/')
+        self.assertEqual(
+            self.series(metrics.REQUEST_SECONDS, 'unresolved')[2], 1
+        )
+
+    def test_metrics_endpoint_is_staff_only(self):
+        """/metrics отдаёт формат Prometheus только персоналу."""
+        self.client.get('/')
+        self.assertEqual(self.client.get('/metrics').status_code, 403)
+        self.client.force_login(self.author)
+        self.assertEqual(self.client.get('/metrics').status_code, 403)
+        self.client.force_login(self.staff)
+        response = self.client.get('/metrics')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/plain'))
+        body = response.content.decode()
+        self.assertIn(
+            '# TYPE yatube_request_duration_seconds histogram', body
+        )
+        self.assertIn(
+            'yatube_sql_queries_bucket{view="posts:index",le="+Inf"} 1', body
+        )
+        self.assertIn('yatube_sql_queries_count{view="posts:index"} 1', body)
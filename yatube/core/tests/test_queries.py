@@ -0,0 +1,72 @@
+from django.contrib.auth import get_user_model
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, override_settings
+
+from core.queries import (QueryBudgetExceeded, QueryWatcher,
+                          QueryWatchMiddleware, fingerprint, query_budget)
+from posts.models import Post
+
+User = get_user_model()
+
+
+@query_budget(2)
+def feed_view(request):
+    posts = Post.objects.order_by('pk')
+    return HttpResponse(', '.join(post.author.username for post in posts))
+
+
+class QueryWatchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        for i in range(3):
+            Post.objects.create(
+                author=User.objects.create_user(username=f'author_{i}'),
+                text=f'Пост {i}'
+            )
+
+    def run_view(self, view):
+        def get_response(request):
+            middleware.process_view(request, view, (), {})
+            return view(request)
+        middleware = QueryWatchMiddleware(get_response)
+        return middleware(RequestFactory().get('/'))
+
+    def test_fingerprint_ignores_values(self):
+        """Отпечаток не зависит от значений и длины списка IN."""
+        self.assertEqual(
+            fingerprint('SELECT * FROM t WHERE id IN (%s, %s) AND x = 5'),
+            fingerprint('SELECT *  FROM t WHERE id IN (%s) AND x = 7'),
+        )
+
+    def test_watcher_finds_n_plus_one(self):
+        """Обращение к автору в цикле распознаётся как N+1."""
+        with QueryWatcher() as watcher:
+            [post.author for post in Post.objects.all()]
+        self.assertEqual(watcher.count, 4)
+        self.assertEqual(list(watcher.repeated().values()), [3])
+        with QueryWatcher() as watcher:
+            [post.author for post in Post.objects.select_related('author')]
+        self.assertEqual(watcher.problems(1), [])
+
+    @override_settings(QUERY_WATCH='strict')
+    def test_strict_mode_fails_view_over_budget(self):
+        """В строгом режиме вид за пределами бюджета роняет запрос."""
+        with self.assertRaisesMessage(QueryBudgetExceeded, 'N+1'):
+            self.run_view(feed_view)
+
+    @override_settings(QUERY_WATCH='log')
+    def test_log_mode_only_warns(self):
+        """В режиме log нарушения пишутся в лог, ответ не меняется."""
+        with self.assertLogs('core.queries', 'WARNING') as logs:
+            response = self.run_view(feed_view)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('при бюджете 2', logs.output[0])
+
+    @override_settings(QUERY_WATCH='strict', QUERY_SLOW_THRESHOLD=0)
+    def test_slow_queries_are_logged(self):
+        """Медленные запросы попадают в лог даже у видов без бюджета."""
+        def view(request):
+            return HttpResponse(Post.objects.count())
+        with self.assertLogs('core.queries', 'WARNING') as logs:
+            self.run_view(view)
+        self.assertIn('медленный запрос', logs.output[0])
@@ -0,0 +1,92 @@
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.sessions.models import Session
+from django.db import router
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, override_settings
+
+from core.replicas import ReplicaMiddleware, read_replica, write_primary
+from posts.cache import cache_ttl
+from posts.models import Post
+
+User = get_user_model()
+
+
+def reading_view(request):
+    request.read_from = router.db_for_read(Post)
+    request.write_to = router.db_for_write(Post)
+    request.auth_from = {
+        router.db_for_read(User), router.db_for_read(Session)
+    }
+    request.cache_ttl = cache_ttl()
+    return HttpResponse()
+
+
+def hinted(decorator):
+    """Подсказка пишется в атрибут, поэтому каждому тесту своя функция."""
+    return decorator(lambda request: reading_view(request))
+
+
+@override_settings(DATABASE_REPLICAS=['replica1'])
+class ReplicaMiddlewareTests(SimpleTestCase):
+    def call(self, view, request):
+        def get_response(request):
+            middleware.process_view(request, view, (), {})
+            return view(request)
+
+        middleware = ReplicaMiddleware(get_response)
+        return middleware(request)
+
+    def test_hinted_view_reads_from_replica(self):
+        """Вид с read_replica читает с реплики, а пишет в основную базу."""
+        request = RequestFactory().get('/')
+        response = self.call(hinted(read_replica), request)
+        self.assertEqual(request.read_from, 'replica1')
+        self.assertEqual(request.write_to, 'default')
+        self.assertNotIn(settings.REPLICA_PIN_COOKIE, response.cookies)
+        self.assertEqual(router.db_for_read(Post), 'default')
+
+    def test_auth_and_sessions_read_primary(self):
+        """Пользователи и сессии не читаются с отстающей реплики."""
+        request = RequestFactory().get('/')
+        self.call(hinted(read_replica), request)
+        self.assertEqual(request.auth_from, {'default'})
+
+    def test_replica_pages_cached_briefly(self):
+        """Отрисованное с реплики кэшируется на REPLICA_CACHE_TTL."""
+        request = RequestFactory().get('/')
+        self.call(hinted(read_replica), request)
+        self.assertEqual(request.cache_ttl, settings.REPLICA_CACHE_TTL)
+        request = RequestFactory().get('/')
+        self.call(reading_view, request)
+        self.assertEqual(request.cache_ttl, settings.FEED_CACHE_TTL)
+
+    def test_view_without_hint_reads_primary(self):
+        """Без подсказки чтение идёт в основную базу."""
+        request = RequestFactory().get('/')
+        self.call(reading_view, request)
+        self.assertEqual(request.read_from, 'default')
+
+    def test_write_pins_client_to_primary(self):
+        """После записи кука направляет чтения клиента в основную базу."""
+        for view, request in (
+            (hinted(write_primary), RequestFactory().get('/')),
+            (reading_view, RequestFactory().post('/')),
+        ):
+            with self.subTest(method=request.method):
+                response = self.call(view, request)
+                self.assertIn(settings.REPLICA_PIN_COOKIE, response.cookies)
+
+        request = RequestFactory().get('/')
+        request.COOKIES[settings.REPLICA_PIN_COOKIE] = str(time.time() + 5)
+        self.call(hinted(read_replica), request)
+        self.assertEqual(request.read_from, 'default')
+
+    def test_expired_pin_reads_from_replica(self):
+        """Просроченная кука больше не держит клиента на основной базе."""
+        request = RequestFactory().get('/')
+        request.COOKIES[settings.REPLICA_PIN_COOKIE] = str(time.time() - 1)
+        self.call(hinted(read_replica), request)
+        self.assertEqual(request.read_from, 'replica1')
@@ -0,0 +1,16 @@
+from importlib import import_module
+
+from django.db.utils import ConnectionHandler
+from django.test import SimpleTestCase
+
+
+class ProfileSettingsTests(SimpleTestCase):
+    def test_persistent_connections(self):
+        """prod и bench держат соединения с базой между запросами."""
+        for profile in ('prod', 'bench'):
+            with self.subTest(profile=profile):
+                databases = import_module(
+                    f'yatube.settings.{profile}'
+                ).DATABASES
+                connection = ConnectionHandler(databases)['default']
+                self.assertEqual(connection.settings_dict['CONN_MAX_AGE'], 60)
@@ -0,0 +1,35 @@
+import copy
+
+from django.conf import settings
+from django.template import engines
+from django.test import SimpleTestCase, override_settings
+
+from core.warmup import warm_templates
+
+
+def templates_with(loaders):
+    templates = copy.deepcopy(settings.TEMPLATES)
+    templates[0]['APP_DIRS'] = False
+    templates[0]['OPTIONS']['loaders'] = loaders
+    return templates
+
+
+class WarmTemplatesTests(SimpleTestCase):
+    def test_without_cached_loader_nothing_to_warm(self):
+        """Без cached.Loader шаблоны заранее не компилируются."""
+        with override_settings(
+            TEMPLATES=templates_with(settings.TEMPLATE_LOADERS)
+        ):
+            self.assertEqual(warm_templates(), 0)
+
+    def test_templates_compiled_into_cache(self):
+        """Все шаблоны проекта попадают в кэш загрузчика."""
+        with override_settings(TEMPLATES=templates_with([
+            ('django.template.loaders.cached.Loader',
+             settings.TEMPLATE_LOADERS),
+        ])):
+            warmed = warm_templates()
+            loader = engines['django'].engine.template_loaders[0]
+            self.assertIn('posts/index.html', loader.get_template_cache)
+            self.assertIn('includes/header.html', loader.get_template_cache)
+            self.assertEqual(warmed, len(loader.get_template_cache))
@@ -0,0 +1,124 @@
+"""Приём картинок без лишней памяти.
+
+LimitedUploadHandler пишет каждый файл сразу во временный файл на диске
+и бросает его, как только он перерос UPLOAD_MAX_BYTES; остаток тела
+запроса вычитывается впустую. Вместо файла форма получает RejectedUpload
+с причиной отказа. Принятому файлу заодно считается SHA-256.
+
+Размер картинки в пикселях Pillow знает по заголовку, не декодируя её,
+поэтому check_dimensions отсекает огромные снимки до проверки Django, а
+downscale один раз уменьшает слишком большие оригиналы прямо в файле
+загрузки.
+"""
+import hashlib
+import io
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files.uploadedfile import UploadedFile
+from django.core.files.uploadhandler import TemporaryFileUploadHandler
+from PIL import Image, ImageOps
+
+SAVE_OPTIONS = {
+    'JPEG': {'quality': 85, 'optimize': True},
+    'PNG': {'optimize': True},
+    'WEBP': {'quality': 85},
+}
+
+
+class RejectedUpload(UploadedFile):
+    """Пустая замена файла, отброшенного при загрузке."""
+
+    def __init__(self, name, content_type, size, reason):
+        super().__init__(io.BytesIO(), name, content_type, size)
+        self.reason = reason
+
+
+class LimitedUploadHandler(TemporaryFileUploadHandler):
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self.received = 0
+        self.rejected = False
+        self.sha256 = hashlib.sha256()
+
+    def receive_data_chunk(self, raw_data, start):
+        self.received += len(raw_data)
+        if self.rejected:
+            return None
+        if self.received > settings.UPLOAD_MAX_BYTES:
+            self.rejected = True
+            # Закрытый временный файл удаляется с диска
+            self.file.close()
+            return None
+        self.sha256.update(raw_data)
+        return super().receive_data_chunk(raw_data, start)
+
+    def file_complete(self, file_size):
+        if not self.rejected:
+            upload = super().file_complete(file_size)
+            # Хранилище по хэшу не перечитывает файл ради имени
+            upload.sha256 = self.sha256.hexdigest()
+            return upload
+        megabytes = settings.UPLOAD_MAX_BYTES / 2 ** 20
+        return RejectedUpload(
+            self.file_name,
+            self.content_type,
+            self.received,
+            f'Файл больше {megabytes:g} МБ',
+        )
+
+
+def check_dimensions(upload):
+    """Отказывает картинке больше IMAGE_MAX_PIXELS по её заголовку.
+
+    Файл, который Pillow не узнал, пропускается: его отвергнет проверка
+    ImageField.
+    """
+    try:
+        with Image.open(upload) as image:
+            width, height = image.size
+    except Image.DecompressionBombError:
+        width = height = settings.IMAGE_MAX_PIXELS
+    except Exception:
+        return
+    finally:
+        upload.seek(0)
+    if width * height > settings.IMAGE_MAX_PIXELS:
+        megapixels = settings.IMAGE_MAX_PIXELS / 10 ** 6
+        raise ValidationError(
+            f'Картинка больше {megapixels:g} мегапикселей',
+            code='too_many_pixels',
+        )
+
+
+def downscale(upload):
+    """Уменьшает оригинал до IMAGE_MAX_SIDE по длинной стороне.
+
+    JPEG декодируется сразу в уменьшенном виде через draft(). Поворот
+    из EXIF применяется к пикселям, сами EXIF (вместе с координатами)
+    в уменьшенную копию не попадают. Анимации остаются как есть.
+    """
+    side = settings.IMAGE_MAX_SIDE
+    upload.seek(0)
+    with Image.open(upload) as image:
+        if max(image.size) <= side or getattr(image, 'is_animated', False):
+            upload.seek(0)
+            return upload
+        image_format = image.format
+        icc_profile = image.info.get('icc_profile')
+        image.draft(image.mode, (side, side))
+        image = ImageOps.exif_transpose(image)
+        image.thumbnail((side, side), Image.LANCZOS)
+        if image_format == 'JPEG' and image.mode not in ('RGB', 'L', 'CMYK'):
+            image = image.convert('RGB')
+        options = dict(SAVE_OPTIONS.get(image_format, {}))
+        if icc_profile:
+            options['icc_profile'] = icc_profile
+        # Картинка уже декодирована, файл загрузки можно перезаписать
+        upload.seek(0)
+        upload.truncate()
+        image.save(upload, image_format, **options)
+    upload.sha256 = None
+    upload.size = upload.tell()
+    upload.seek(0)
+    return upload
@@ -0,0 +1,39 @@
+import logging
+import os
+
+from django.template import TemplateSyntaxError, engines
+from django.template.loaders.cached import Loader as CachedLoader
+
+logger = logging.getLogger(__name__)
+
+
+def _template_names(directory):
+    for root, _, files in os.walk(directory):
+        for name in files:
+            path = os.path.relpath(os.path.join(root, name), directory)
+            yield path.replace(os.sep, '/')
+
+
+def warm_templates():
+    """Компилирует шаблоны из TEMPLATES['DIRS'] в кэш cached.Loader.
+
+    Вызывается при старте воркера; без кэширующего загрузчика (DEBUG)
+    компилировать заранее бессмысленно, и функция возвращает 0.
+    """
+    warmed = 0
+    for backend in engines.all():
+        engine = getattr(backend, 'engine', None)
+        if engine is None or not any(
+            isinstance(loader, CachedLoader)
+            for loader in engine.template_loaders
+        ):
+            continue
+        for directory in engine.dirs:
+            for name in sorted(_template_names(directory)):
+                try:
+                    engine.get_template(name)
+                except TemplateSyntaxError:
+                    logger.exception('Шаблон %s не компилируется', name)
+                else:
+                    warmed += 1
+    return warmed
@@ -1,9 +1,41 @@
+from django import forms
 from django.contrib import admin
 
+from core.paginator import EstimatedCountPaginator
+
+from . import cache, search
 from .models import Group, Post, Follow, Comment
 
 
-class PostAdmin(admin.ModelAdmin):
+class CachedChoiceField(forms.ModelChoiceField):
+    """Выбор из готового списка: каждая строка changelist с
+    list_editable иначе заново запрашивает всю таблицу."""
+
+    def __init__(self, queryset, *, choices, **kwargs):
+        self.cached_choices = choices
+        super().__init__(queryset, **kwargs)
+
+    def _get_choices(self):
+        return [('', self.empty_label), *self.cached_choices]
+
+    choices = property(_get_choices, forms.ChoiceField._set_choices)
+
+
+def group_choices():
+    """[(pk, название)] групп; сбрасывается вместе с лентой 'groups'."""
+    return cache.get_or_set('groups', 'admin_choices', lambda: list(
+        Group.objects.order_by('title').values_list('pk', 'title')
+    ))
+
+
+class LargeTableAdmin(admin.ModelAdmin):
+    # Без COUNT(*) по всей таблице, в том числе для «всего N» рядом
+    # с результатами поиска
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+
+class PostAdmin(LargeTableAdmin):
     list_display = (
         'pk',
         'text',
@@ -12,10 +44,33 @@ class PostAdmin(admin.ModelAdmin):
         'group',
     )
     list_editable = ('group',)
+    list_select_related = ('author', 'group')
+    autocomplete_fields = ('author', 'group')
     search_fields = ('text',)
     list_filter = ('pub_date',)
     empty_value_display = '-пусто-'
 
+    def get_changelist_formset(self, request, **kwargs):
+        request.group_choices = group_choices()
+        return super().get_changelist_formset(request, **kwargs)
+
+    def formfield_for_foreignkey(self, db_field, request, **kwargs):
+        choices = getattr(request, 'group_choices', None)
+        if db_field.name == 'group' and choices is not None:
+            kwargs.update(form_class=CachedChoiceField, choices=choices)
+            return db_field.formfield(**kwargs)
+        return super().formfield_for_foreignkey(db_field, request, **kwargs)
+
+    def get_search_results(self, request, queryset, search_term):
+        # Ищем по индексу FTS5, а не LIKE '%...%' по всей таблице
+        if not search.match_expression(search_term):
+            return super().get_search_results(
+                request, queryset, search_term
+            )
+        return queryset.filter(
+            pk__in=search.matching_post_ids(search_term)
+        ), False
+
 
 class GroupAdmin(admin.ModelAdmin):
     list_display = (
@@ -28,24 +83,29 @@ class GroupAdmin(admin.ModelAdmin):
     empty_value_display = '-пусто-'
 
 
-class CommentAdmin(admin.ModelAdmin):
+class CommentAdmin(LargeTableAdmin):
     list_display = (
         'pk',
         'author',
         'text',
         'created'
     )
+    list_select_related = ('author',)
+    autocomplete_fields = ('author',)
+    raw_id_fields = ('post',)
     search_fields = ('text',)
     list_filter = ('created',)
     empty_value_display = '-пусто-'
 
 
-class FollowAdmin(admin.ModelAdmin):
+class FollowAdmin(LargeTableAdmin):
     list_display = (
         'user',
         'author',
     )
-    search_fields = ('author',)
+    list_select_related = ('user', 'author')
+    autocomplete_fields = ('user', 'author')
+    search_fields = ('author__username',)
     empty_value_display = '-пусто-'
 
 
@@ -0,0 +1,174 @@
+import time
+from functools import wraps
+from hashlib import md5
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+
+from core.replicas import current_replica
+
+VERSION_KEY = 'feed-version:{}'
+PAGE_KEY = 'anonymous-page:{}'
+# Как часто ждущий запрос проверяет, не готова ли страница
+PAGE_POLL_INTERVAL = 0.01
+
+
+def _key(feed):
+    if isinstance(feed, tuple):
+        feed = ':'.join(str(part) for part in feed)
+    return VERSION_KEY.format(feed)
+
+
+def get_version(*feeds):
+    """Версия лент для ключа фрагментного кэша.
+
+    Лента задаётся строкой ('index') или кортежем (('group', pk)).
+    """
+    keys = [_key(feed) for feed in feeds]
+    versions = cache.get_many(keys)
+    missing = {key: time.time_ns() for key in keys if key not in versions}
+    if missing:
+        cache.set_many(missing, None)
+        versions.update(missing)
+    return '.'.join(str(versions[key]) for key in keys)
+
+
+def bump(*feeds):
+    """Инвалидирует фрагменты лент, выдав им новую версию."""
+    if feeds:
+        version = time.time_ns()
+        cache.set_many({_key(feed): version for feed in feeds}, None)
+
+
+def cache_ttl():
+    """TTL записей лент; прочитанное с реплики могло отстать от версии."""
+    if current_replica() is not None:
+        return settings.REPLICA_CACHE_TTL
+    return settings.FEED_CACHE_TTL
+
+
+def feed_context(*feeds):
+    """Переменные для тега {% cache %} в шаблонах лент."""
+    return {
+        'feed_version': get_version(*feeds),
+        'feed_cache_ttl': cache_ttl(),
+    }
+
+
+class FeedValidators:
+    """ETag и Last-Modified страницы из версий её лент.
+
+    Версия ленты - время последней инвалидации, поэтому ответ 304
+    отдаётся без SQL-запросов к лентам и без отрисовки шаблона.
+    """
+
+    def __init__(self, request, *feeds):
+        self.feeds = feeds
+        self.version = get_version(*feeds)
+        user = 'anon'
+        if request.user.is_authenticated:
+            # Формы на странице несут токен CSRF, а вход выдаёт новый:
+            # с прежним токеном отправка формы получила бы 403
+            csrf = request.META.get('CSRF_COOKIE', '')
+            user = f'{request.user.pk}-{md5(csrf.encode()).hexdigest()[:8]}'
+        self.etag = quote_etag(f'{user}-{self.version}')
+        # Last-Modified с точностью до секунды, точнее сравнивает ETag
+        self.last_modified = max(
+            int(version) for version in self.version.split('.')
+        ) // 10 ** 9
+
+    def not_modified(self, request):
+        """Ответ 304 или None, если страницу нужно отрисовать."""
+        return get_conditional_response(
+            request, etag=self.etag, last_modified=self.last_modified
+        )
+
+    def context(self):
+        return {
+            'feed_version': self.version,
+            'feed_cache_ttl': cache_ttl(),
+        }
+
+    def apply(self, response):
+        response.feed_validators = self
+        response['ETag'] = self.etag
+        response['Last-Modified'] = http_date(self.last_modified)
+        return response
+
+
+def get_or_set(feed, name, default):
+    """Значение, которое живёт в кэше до следующей инвалидации ленты."""
+    key = f'{_key(feed)}:{name}:{get_version(feed)}'
+    return cache.get_or_set(key, default, cache_ttl())
+
+
+def _cached_page(request, key):
+    """Страница из кэша, если её ленты с тех пор не менялись."""
+    entry = cache.get(key)
+    if entry is None:
+        return None
+    validators = FeedValidators(request, *entry['feeds'])
+    if validators.version != entry['version']:
+        return None
+    return validators.not_modified(request) or validators.apply(
+        HttpResponse(entry['content'], content_type=entry['content_type'])
+    )
+
+
+def _store_page(key, response):
+    validators = getattr(response, 'feed_validators', None)
+    # Ответ с кукой (например, csrftoken) принадлежит одному клиенту
+    if validators is None or response.status_code != 200 or response.cookies:
+        return
+    cache.set(key, {
+        'feeds': validators.feeds,
+        'version': validators.version,
+        'content': response.content,
+        'content_type': response['Content-Type'],
+    }, cache_ttl())
+
+
+def _wait_for_page(request, key):
+    deadline = time.monotonic() + settings.PAGE_CACHE_WAIT
+    while time.monotonic() < deadline:
+        time.sleep(PAGE_POLL_INTERVAL)
+        response = _cached_page(request, key)
+        if response is not None:
+            return response
+    return None
+
+
+def anonymous_page(view):
+    """Кэш целых страниц лент для гостей.
+
+    Ключ - путь с параметрами, актуальность проверяется по версиям лент,
+    которые вид передал в FeedValidators. Страницу после промаха рисует
+    один запрос, остальные до PAGE_CACHE_WAIT секунд ждут его результата.
+    """
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if (request.method not in ('GET', 'HEAD')
+                or request.user.is_authenticated):
+            return view(request, *args, **kwargs)
+        key = PAGE_KEY.format(
+            md5(request.get_full_path().encode()).hexdigest()
+        )
+        response = _cached_page(request, key)
+        if response is not None:
+            return response
+        lock = f'{key}:lock'
+        if not cache.add(lock, 1, settings.PAGE_CACHE_LOCK_TIMEOUT):
+            response = _wait_for_page(request, key)
+            if response is not None:
+                return response
+            return view(request, *args, **kwargs)
+        try:
+            response = view(request, *args, **kwargs)
+            _store_page(key, response)
+        finally:
+            cache.delete(lock)
+        return response
+    return wrapper
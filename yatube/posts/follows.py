@@ -0,0 +1,108 @@
+"""Подписка и отписка сразу на много авторов.
+
+Сигналы Follow обновляют счётчики, ленты и кэш на каждую строку. Здесь
+строки пишутся одним bulk_create или DELETE, а последствия применяются
+один раз на пачку, поэтому пачка не больше FOLLOW_BATCH_SIZE: столько
+параметров помещается в один IN-запрос SQLite.
+"""
+import threading
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import transaction
+
+from . import cache, recommend, stats, timeline
+from .models import Follow, Suggestion, User
+
+
+_bulk = threading.local()
+
+
+def in_bulk():
+    """Идёт массовое изменение: сигналы Follow пропускают свою работу."""
+    return getattr(_bulk, 'active', False)
+
+
+@contextmanager
+def _bulk_change():
+    _bulk.active = True
+    try:
+        yield
+    finally:
+        _bulk.active = False
+
+
+def _resolve(user, usernames):
+    """({username: id} найденных авторов, отсортированные не найденные).
+
+    Себя читатель не подписывает и в не найденных не видит.
+    """
+    usernames = set(usernames) - {user.username}
+    if len(usernames) > settings.FOLLOW_BATCH_SIZE:
+        raise ValueError(
+            f'Не больше {settings.FOLLOW_BATCH_SIZE} авторов за раз'
+        )
+    authors = dict(
+        User.objects.filter(username__in=usernames)
+        .values_list('username', 'pk')
+    )
+    return authors, sorted(usernames - set(authors))
+
+
+def _names(authors, author_ids):
+    author_ids = set(author_ids)
+    return sorted(
+        username for username, pk in authors.items() if pk in author_ids
+    )
+
+
+def _changed(user, author_ids):
+    recommend.mark_stale([user.pk])
+    cache.bump(
+        ('follow', user.pk),
+        ('profile', user.pk),
+        ('suggestions', user.pk),
+        *(('profile', author_id) for author_id in author_ids),
+    )
+
+
+@transaction.atomic
+def follow_many(user, usernames):
+    """Подписывает user на авторов; возвращает (подписан, не найдены)."""
+    authors, missing = _resolve(user, usernames)
+    followed = set(
+        Follow.objects.filter(user=user, author_id__in=authors.values())
+        .values_list('author_id', flat=True)
+    )
+    new_ids = [pk for pk in authors.values() if pk not in followed]
+    if new_ids:
+        # ignore_conflicts на случай параллельной подписки на того же
+        # автора; расхождение счётчиков тогда чинит recount_stats
+        Follow.objects.bulk_create(
+            (Follow(user=user, author_id=pk) for pk in new_ids),
+            ignore_conflicts=True
+        )
+        stats.change_user(user.pk, following_count=len(new_ids))
+        stats.change_users(new_ids, followers_count=1)
+        timeline.backfill(user.pk, *new_ids)
+        Suggestion.objects.filter(user=user, author_id__in=new_ids).delete()
+        _changed(user, new_ids)
+    return _names(authors, new_ids), missing
+
+
+@transaction.atomic
+def unfollow_many(user, usernames):
+    """Отписывает user от авторов; возвращает (отписан, не найдены)."""
+    authors, missing = _resolve(user, usernames)
+    follows = Follow.objects.filter(user=user, author_id__in=authors.values())
+    removed_ids = list(follows.values_list('author_id', flat=True))
+    if removed_ids:
+        # post_delete уходит на каждую строку, но follow_deleted внутри
+        # пачки ничего не делает: последствия применяются ниже разом
+        with _bulk_change():
+            follows.delete()
+        stats.change_user(user.pk, following_count=-len(removed_ids))
+        stats.change_users(removed_ids, followers_count=-1)
+        timeline.prune(user.pk, *removed_ids)
+        _changed(user, removed_ids)
+    return _names(authors, removed_ids), missing
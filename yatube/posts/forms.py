@@ -1,4 +1,7 @@
 from django import forms
+from django.core.files.uploadedfile import UploadedFile
+
+from core import uploads
 
 from .models import Comment, Post
 
@@ -12,6 +15,28 @@ class PostForm(forms.ModelForm):
         help_text = {'text': 'Напишите ваш текст тут',
                      'group': 'Из уже существующих'}
 
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Отброшенный при загрузке файл ImageField приняла бы за битую
+        # картинку; причина отказа показывается в clean_image
+        self.rejected_image = self.files.get('image')
+        if isinstance(self.rejected_image, uploads.RejectedUpload):
+            self.files = self.files.copy()
+            del self.files['image']
+        else:
+            self.rejected_image = None
+
+    def clean_image(self):
+        if self.rejected_image is not None:
+            raise forms.ValidationError(
+                self.rejected_image.reason, code='file_too_large'
+            )
+        image = self.cleaned_data['image']
+        if not isinstance(image, UploadedFile):
+            return image
+        uploads.check_dimensions(image)
+        return uploads.downscale(image)
+
 
 class CommentForm(forms.ModelForm):
     class Meta:
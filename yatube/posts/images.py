@@ -0,0 +1,98 @@
+"""Счётчики ссылок на файлы картинок.
+
+Одинаковые картинки разных постов хранятся одним файлом (хранилище по
+хэшу), поэтому файл и его миниатюры удаляются, только когда на него не
+ссылается ни один пост.
+"""
+import logging
+
+from django.db import transaction
+from django.db.models import Count, F
+from sorl.thumbnail.default import kvstore
+from sorl.thumbnail.images import ImageFile
+
+from .models import ImageBlob, Post
+
+logger = logging.getLogger(__name__)
+
+
+def _storage():
+    return Post._meta.get_field('image').storage
+
+
+def acquire(name):
+    blobs = ImageBlob.objects.filter(name=name)
+    if not blobs.update(references=F('references') + 1):
+        # Строку мог успеть создать параллельный запрос, поэтому
+        # создаётся пустая и ссылка добавляется тем же UPDATE
+        ImageBlob.objects.bulk_create(
+            [ImageBlob(name=name)], ignore_conflicts=True
+        )
+        blobs.update(references=F('references') + 1)
+
+
+def reserve(image):
+    """Берёт ссылку на ещё не сохранённую картинку и возвращает её имя.
+
+    Вызывается до FieldFile.save(): пока ссылка есть, collect не удалит
+    файл с тем же содержимым, который хранилище решит не записывать.
+    """
+    name = image.storage.content_name(
+        image.field.generate_filename(image.instance, image.name),
+        image.file,
+    )
+    acquire(name)
+    return name
+
+
+def release(name):
+    ImageBlob.objects.filter(name=name, references__gt=0).update(
+        references=F('references') - 1
+    )
+    transaction.on_commit(lambda: collect(name))
+
+
+def collect(name):
+    """Удаляет файл без ссылок вместе с миниатюрами; True, если удалён."""
+    storage = _storage()
+    # Файл удаляется в транзакции, удалившей строку: reserve() с тем же
+    # именем дождётся её коммита и увидит, что файла уже нет
+    with transaction.atomic():
+        deleted, _ = ImageBlob.objects.filter(
+            name=name, references=0
+        ).delete()
+        if not deleted:
+            return False
+        try:
+            kvstore.delete(ImageFile(name, storage))
+            storage.delete(name)
+        except Exception:
+            # Вызывается после коммита: ответ уже не должен падать
+            logger.exception('Не удалось удалить картинку %s', name)
+    return True
+
+
+def recount():
+    """Пересчитывает ссылки по постам и удаляет осиротевшие файлы.
+
+    Возвращает число файлов, на которые ссылаются посты.
+    """
+    references = dict(
+        Post.objects.exclude(image='').order_by().values('image')
+        .annotate(total=Count('pk')).values_list('image', 'total')
+    )
+    with transaction.atomic():
+        orphans = set(
+            ImageBlob.objects.values_list('name', flat=True)
+        ) - set(references)
+        ImageBlob.objects.all().delete()
+        ImageBlob.objects.bulk_create(
+            [
+                ImageBlob(name=name, references=total)
+                for name, total in references.items()
+            ] + [ImageBlob(name=name) for name in orphans],
+            batch_size=500
+        )
+    for name in orphans:
+        collect(name)
+    return len(references)
@@ -0,0 +1,60 @@
+import sys
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from posts import follows
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = (
+        'Подписывает пользователя на авторов из файла: по одному '
+        'username в строке'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('username', help='кого подписывать')
+        parser.add_argument(
+            'file', nargs='?', default='-',
+            help='файл со списком авторов; по умолчанию stdin'
+        )
+        parser.add_argument(
+            '--unfollow', action='store_true',
+            help='отписать от авторов из списка'
+        )
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(username=options['username'])
+        except User.DoesNotExist:
+            raise CommandError(f'Нет пользователя {options["username"]}')
+        action = (
+            follows.unfollow_many if options['unfollow']
+            else follows.follow_many
+        )
+        if options['file'] == '-':
+            usernames = self.read(sys.stdin)
+        else:
+            with open(options['file'], encoding='utf-8') as source:
+                usernames = self.read(source)
+        batch = settings.FOLLOW_BATCH_SIZE
+        changed = missing = 0
+        for start in range(0, len(usernames), batch):
+            done, absent = action(user, usernames[start:start + batch])
+            changed += len(done)
+            missing += len(absent)
+            for username in absent:
+                self.stderr.write(f'Нет автора {username}')
+        self.stdout.write(
+            f'Изменено подписок: {changed}, не найдено авторов: {missing}'
+        )
+
+    @staticmethod
+    def read(lines):
+        # Без повторов: каждый автор попадает только в одну пачку
+        return list(dict.fromkeys(
+            line.strip() for line in lines if line.strip()
+        ))
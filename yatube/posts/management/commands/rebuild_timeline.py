@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+
+from posts import timeline
+
+
+class Command(BaseCommand):
+    help = 'Пересобирает ленты подписок из таблицы Follow'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'user_ids', nargs='*', type=int,
+            help='id читателей; по умолчанию пересобираются все ленты'
+        )
+        parser.add_argument(
+            '--trim', action='store_true',
+            help='только обрезать ленты до TIMELINE_MAX_ENTRIES постов'
+        )
+
+    def handle(self, *args, **options):
+        if options['trim']:
+            removed = timeline.trim(options['user_ids'] or None)
+            self.stdout.write(f'Удалено записей: {removed}')
+            return
+        users = timeline.rebuild(options['user_ids'] or None)
+        self.stdout.write(f'Пересобрано лент: {users}')
@@ -0,0 +1,29 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from posts import recommend
+
+
+class Command(BaseCommand):
+    help = (
+        'Пересчитывает рекомендации «Кого почитать» для читателей, '
+        'чьи подписки изменились'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--all', action='store_true',
+            help='пересчитать рекомендации всех пользователей'
+        )
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        if options['all']:
+            users = recommend.recompute_all()
+        else:
+            users = recommend.recompute()
+        self.stdout.write(
+            f'Пересчитаны рекомендации: {users} '
+            f'({time.perf_counter() - started:.1f} с)'
+        )
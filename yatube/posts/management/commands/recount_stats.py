@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from posts import images, stats
+
+
+class Command(BaseCommand):
+    help = (
+        'Пересчитывает счётчики постов, комментариев, подписок '
+        'и ссылок на картинки'
+    )
+
+    def handle(self, *args, **options):
+        users = stats.recount_all()
+        self.stdout.write(f'Пересчитано пользователей: {users}')
+        files = images.recount()
+        self.stdout.write(f'Картинок в постах: {files}')
@@ -0,0 +1,48 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from posts import thumbnails
+from posts.models import Post
+
+
+class Command(BaseCommand):
+    help = 'Создаёт миниатюры для картинок всех постов'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers', type=int, default=settings.THUMBNAIL_WORKERS or 1,
+            help='число потоков, генерирующих миниатюры'
+        )
+
+    def handle(self, *args, **options):
+        images = (
+            Post.objects.exclude(image='')
+            .values_list('image', flat=True)
+            .iterator()
+        )
+        if options['workers'] > 1:
+            with ThreadPoolExecutor(max_workers=options['workers']) as pool:
+                warmed, failed = self.report(pool.map(self.warm, images))
+        else:
+            warmed, failed = self.report(map(self.warm, images))
+        self.stdout.write(f'Миниатюры готовы: {warmed}, ошибок: {failed}')
+
+    def report(self, results):
+        warmed = failed = 0
+        for name, error in results:
+            if error is None:
+                warmed += 1
+            else:
+                failed += 1
+                self.stderr.write(f'{name}: {error}')
+        return warmed, failed
+
+    @staticmethod
+    def warm(name):
+        try:
+            thumbnails.warm(name)
+        except Exception as error:
+            return name, error
+        return name, None
@@ -0,0 +1,262 @@
+"""Рекомендации «Кого почитать» по графу подписок.
+
+Граф целиком загружается в массивы NumPy в формате CSR: подписки
+пользователя с номером i лежат в targets[pointers[i]:pointers[i + 1]],
+подписчики - в таких же массивах обратного графа. Номера - позиции id в
+отсортированном списке пользователей, поэтому граф занимает по 16 байт
+на ребро, а строится сортировкой и подсчётом без цикла по рёбрам.
+
+Кандидат c получает очки за пути u -> v -> c (друзья друзей) и за
+подписки читателей, у которых больше всего общих авторов с u, с весом
+по числу общих авторов (совместные подписки). Пользователям без таких
+кандидатов достаются популярные авторы. Оценки считаются сразу для
+пачки пользователей: соседи всей пачки собираются из срезов CSR, а
+очки пар (пользователь, кандидат) складываются np.unique и np.bincount.
+"""
+from itertools import chain
+
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+
+from . import cache
+from .models import Follow, StaleSuggestions, Suggestion, User
+
+# Путь через того, кого читаешь сам, весит больше совпадения вкусов
+FRIENDS_WEIGHT = 2
+CO_FOLLOW_WEIGHT = 1
+# Совместные подписки берутся у стольких самых похожих читателей
+SIMILAR_READERS = 20
+# Столько пользователей пересчитывается и пишется за одну транзакцию
+CHUNK_SIZE = 500
+# Столько пользователей оценивается одним набором массивов: пути друзей
+# друзей всей пачки держатся в памяти одновременно
+SCORE_BATCH = 100
+
+
+def _csr(size, sources, targets):
+    """(pointers, targets), сгруппированные по sources."""
+    pointers = np.zeros(size + 1, dtype=np.int64)
+    np.cumsum(np.bincount(sources, minlength=size), out=pointers[1:])
+    return pointers, targets[np.argsort(sources, kind='stable')]
+
+
+def _gather(csr, rows, limit=None):
+    """(owners, neighbours) - соседи строк rows подряд.
+
+    owners - позиция строки в rows. С limit от строки берётся не больше
+    limit соседей с равным шагом: выборка детерминирована.
+    """
+    pointers, targets = csr
+    starts = pointers[rows]
+    lengths = pointers[rows + 1] - starts
+    steps = np.ones_like(lengths)
+    if limit is not None:
+        steps = np.maximum(-(-lengths // limit), 1)
+        lengths = -(-lengths // steps)
+    owners = np.repeat(np.arange(len(rows)), lengths)
+    offsets = np.arange(len(owners)) - np.repeat(
+        np.cumsum(lengths) - lengths, lengths
+    )
+    positions = np.repeat(starts, lengths) + offsets * np.repeat(
+        steps, lengths
+    )
+    return owners, targets[positions]
+
+
+def _ranks(owners):
+    """Место каждого элемента в своей группе; owners отсортированы."""
+    return np.arange(len(owners)) - np.searchsorted(owners, owners)
+
+
+def _top(owners, items, scores, limit):
+    """Не больше limit лучших items каждой группы по убыванию scores,
+    при равенстве - по возрастанию items."""
+    order = np.lexsort((items, -scores, owners))
+    owners, items, scores = owners[order], items[order], scores[order]
+    keep = _ranks(owners) < limit
+    return owners[keep], items[keep], scores[keep]
+
+
+class FollowGraph:
+    def __init__(self, user_ids, edges):
+        self.user_ids = np.array(user_ids, dtype=np.int64)
+        pairs = np.fromiter(chain.from_iterable(edges), dtype=np.int64)
+        positions, found = self._positions(pairs)
+        # Подписки пользователей, появившихся после загрузки списка
+        found = found.reshape(-1, 2).all(axis=1)
+        sources, targets = positions.reshape(-1, 2)[found].T
+        size = len(self.user_ids)
+        self.following = _csr(size, sources, targets)
+        self.followers = _csr(size, targets, sources)
+        self.popular = np.argsort(
+            -np.diff(self.followers[0]), kind='stable'
+        )[:settings.SUGGESTIONS_TOP_K * 2]
+
+    @classmethod
+    def load(cls):
+        user_ids = User.objects.order_by('pk').values_list('pk', flat=True)
+        edges = Follow.objects.values_list('user_id', 'author_id')
+        return cls(list(user_ids), edges.iterator(chunk_size=10000))
+
+    def _positions(self, user_ids):
+        """(номера user_ids в графе, маска тех, кто в нём есть)."""
+        user_ids = np.asarray(user_ids, dtype=np.int64)
+        positions = np.searchsorted(self.user_ids, user_ids)
+        found = positions < len(self.user_ids)
+        found[found] = self.user_ids[positions[found]] == user_ids[found]
+        return positions, found
+
+    def existing(self, user_ids):
+        """Отсортированные user_ids, которые есть в графе."""
+        positions, found = self._positions(sorted(set(user_ids)))
+        return self.user_ids[positions[found]].tolist()
+
+    def with_followers(self, user_ids):
+        """Отсортированные user_ids из графа вместе с их подписчиками."""
+        positions, found = self._positions(list(user_ids))
+        users = positions[found]
+        _, followers = _gather(self.followers, users)
+        return np.union1d(
+            self.user_ids[users], self.user_ids[followers]
+        ).tolist()
+
+    def suggest(self, user_id, limit):
+        """[(id автора, оценка)] лучших кандидатов для пользователя."""
+        return self.suggest_many([user_id], limit)[user_id]
+
+    def suggest_many(self, user_ids, limit):
+        """{id пользователя: [(id автора, оценка)]} для пользователей
+        из графа."""
+        positions, found = self._positions(user_ids)
+        users = positions[found]
+        suggestions = {}
+        for start in range(0, len(users), SCORE_BATCH):
+            batch = users[start:start + SCORE_BATCH]
+            owners, candidates, scores = self._score(batch, limit)
+            for owner, candidate, score in zip(
+                self.user_ids[batch][owners].tolist(),
+                self.user_ids[candidates].tolist(),
+                scores.tolist(),
+            ):
+                suggestions.setdefault(owner, []).append((candidate, score))
+            for user_id in self.user_ids[batch].tolist():
+                suggestions.setdefault(user_id, [])
+        return suggestions
+
+    def _co_follows(self, users):
+        """(owners, кандидаты, очки) от самых похожих читателей."""
+        size = len(self.user_ids)
+        sample = settings.SUGGESTIONS_SAMPLE
+        owners, authors = _gather(self.following, users, sample)
+        pairs, readers = _gather(self.followers, authors, sample)
+        owners = owners[pairs]
+        own = readers == users[owners]
+        keys, overlap = np.unique(
+            owners[~own] * size + readers[~own], return_counts=True
+        )
+        owners, readers, overlap = _top(
+            keys // size, keys % size, overlap, SIMILAR_READERS
+        )
+        pairs, candidates = _gather(self.following, readers)
+        return owners[pairs], candidates, CO_FOLLOW_WEIGHT * overlap[pairs]
+
+    def _score(self, users, limit):
+        """(owners, кандидаты, оценки) пачки: owners - позиция в users,
+        в группе сначала лучшие по убыванию оценки, затем популярные."""
+        size = len(self.user_ids)
+        owners, authors = _gather(self.following, users)
+        paths, friends = _gather(self.following, authors)
+        co_owners, co_candidates, co_scores = self._co_follows(users)
+        keys, inverse = np.unique(np.concatenate((
+            owners[paths] * size + friends,
+            co_owners * size + co_candidates,
+        )), return_inverse=True)
+        scores = np.bincount(inverse, weights=np.concatenate((
+            np.full(len(paths), FRIENDS_WEIGHT), co_scores
+        )))
+        excluded = np.concatenate((
+            owners * size + authors,
+            np.arange(len(users)) * size + users,
+        ))
+        allowed = ~np.isin(keys, excluded)
+        best_owners, best, scores = _top(
+            keys[allowed] // size, keys[allowed] % size, scores[allowed],
+            limit
+        )
+        # Не хватило кандидатов - добавляются популярные авторы
+        fill_owners = np.repeat(np.arange(len(users)), len(self.popular))
+        fill = np.tile(self.popular, len(users))
+        allowed = ~np.isin(
+            fill_owners * size + fill,
+            np.concatenate((excluded, best_owners * size + best)),
+        )
+        fill_owners, fill = fill_owners[allowed], fill[allowed]
+        shown = np.bincount(best_owners, minlength=len(users))
+        allowed = _ranks(fill_owners) < limit - shown[fill_owners]
+        fill_owners, fill = fill_owners[allowed], fill[allowed]
+        order = np.argsort(
+            np.concatenate((best_owners, fill_owners)), kind='stable'
+        )
+        return (
+            np.concatenate((best_owners, fill_owners))[order],
+            np.concatenate((best, fill))[order],
+            np.concatenate((scores, np.zeros(len(fill))))[order],
+        )
+
+
+def mark_stale(user_ids):
+    StaleSuggestions.objects.bulk_create(
+        (StaleSuggestions(user_id=user_id) for user_id in user_ids),
+        ignore_conflicts=True
+    )
+
+
+def _save(graph, user_ids):
+    limit = settings.SUGGESTIONS_TOP_K
+    suggestions = graph.suggest_many(user_ids, limit)
+    with transaction.atomic():
+        Suggestion.objects.filter(user_id__in=user_ids).delete()
+        Suggestion.objects.bulk_create(
+            Suggestion(user_id=user_id, author_id=author_id, score=score)
+            for user_id in user_ids
+            for author_id, score in suggestions[user_id]
+        )
+    cache.bump(*(('suggestions', user_id) for user_id in user_ids))
+
+
+def recompute(user_ids=None):
+    """Пересчитывает рекомендации; по умолчанию - только устаревшие.
+
+    Отметка значит, что изменились подписки читателя, поэтому вместе с
+    ним пересчитываются его подписчики: у них поменялись друзья друзей.
+    Отметки снимаются до загрузки графа: подписка, изменившаяся во время
+    пересчёта, снова отметит читателя. Возвращает число пользователей,
+    чьи рекомендации записаны.
+    """
+    stale = user_ids is None
+    if stale:
+        user_ids = StaleSuggestions.objects.values_list('user_id', flat=True)
+    user_ids = sorted(set(user_ids))
+    if not user_ids:
+        return 0
+    for start in range(0, len(user_ids), CHUNK_SIZE):
+        StaleSuggestions.objects.filter(
+            user_id__in=user_ids[start:start + CHUNK_SIZE]
+        ).delete()
+    try:
+        graph = FollowGraph.load()
+        if stale:
+            user_ids = graph.with_followers(user_ids)
+        else:
+            user_ids = graph.existing(user_ids)
+        for start in range(0, len(user_ids), CHUNK_SIZE):
+            _save(graph, user_ids[start:start + CHUNK_SIZE])
+    except BaseException:
+        mark_stale(user_ids)
+        raise
+    return len(user_ids)
+
+
+def recompute_all():
+    return recompute(User.objects.values_list('pk', flat=True))
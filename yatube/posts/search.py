@@ -0,0 +1,57 @@
+import re
+
+from django.db import connection
+from django.utils.html import escape
+from django.utils.safestring import mark_safe
+
+from .models import FEED_FIELDS, Post, PostSearchIndex
+
+# Метки, которыми highlight() обрамляет найденные слова; в тексте
+# поста их не бывает, поэтому текст можно экранировать целиком.
+MARK_START = '\x02'
+MARK_END = '\x03'
+
+TOKEN = re.compile(r'\w+')
+
+
+def available():
+    """Индекс FTS5 создаётся миграцией только на SQLite."""
+    return connection.vendor == 'sqlite'
+
+
+def match_expression(query):
+    """Запрос пользователя как безопасное выражение FTS5 (И по словам)."""
+    return ' '.join(f'"{token}"' for token in TOKEN.findall(query))
+
+
+def matching(query):
+    """Записи индекса, подходящие под запрос, с подсветкой и автором."""
+    return PostSearchIndex.objects.filter(
+        text__match=match_expression(query)
+    ).select_related('post__author', 'post__group').only(
+        'rank', 'post', 'post__author', 'post__group',
+        *(f'post__{field}' for field in FEED_FIELDS)
+    ).extra(select={
+        'highlighted': (
+            f"highlight(posts_post_fts, 0, "
+            f"'{MARK_START}', '{MARK_END}')"
+        ),
+    })
+
+
+def matching_post_ids(query):
+    """Подзапрос с id постов, подходящих под запрос."""
+    if available():
+        return PostSearchIndex.objects.filter(
+            text__match=match_expression(query)
+        ).values('post')
+    return Post.objects.filter(text__icontains=query).values('pk')
+
+
+def highlight(text):
+    """HTML с <mark> вокруг найденных слов и экранированным остальным."""
+    return mark_safe(
+        escape(text)
+        .replace(MARK_START, '<mark>')
+        .replace(MARK_END, '</mark>')
+    )
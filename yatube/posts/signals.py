@@ -0,0 +1,145 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from . import (cache, follows, images, recommend, stats, thumbnails,
+               timeline)
+from .models import (Comment, Follow, Group, Post, Suggestion, User,
+                     UserStats)
+
+
+def _post_feeds(post):
+    feeds = {'index', ('profile', post.author_id), ('post', post.pk)}
+    for group_id in (post.group_id, getattr(post, '_old_group_id', None)):
+        if group_id is not None:
+            feeds.add(('group', group_id))
+    return feeds
+
+
+def _follow_feeds(follow):
+    # Счётчики подписок и кнопка «Подписаться» живут на страницах профилей
+    return (
+        ('follow', follow.user_id),
+        ('profile', follow.user_id),
+        ('profile', follow.author_id),
+        ('suggestions', follow.user_id),
+    )
+
+
+def _suggestions_changed(follow):
+    # Подписчиков читателя добавит recommend_follows по графу
+    recommend.mark_stale([follow.user_id])
+
+
+@receiver(post_save, sender=User)
+def user_created(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        UserStats.objects.get_or_create(user=instance)
+        # Новичку команда recommend_follows подберёт популярных авторов
+        recommend.mark_stale([instance.pk])
+
+
+@receiver(pre_save, sender=Post)
+def post_changing(sender, instance, raw=False, update_fields=None,
+                  **kwargs):
+    if raw:
+        return
+    if instance.pk:
+        instance._old_group_id, instance._old_image = Post.objects.filter(
+            pk=instance.pk
+        ).values_list('group_id', 'image').first() or (None, None)
+    image = instance.image
+    if image and not image._committed and (
+        update_fields is None or 'image' in update_fields
+    ):
+        # Ссылка берётся до записи файла, см. images.reserve
+        instance._reserved_image = images.reserve(image)
+
+
+def _image_changed(post, update_fields):
+    reserved = post.__dict__.pop('_reserved_image', None)
+    if update_fields is not None and 'image' not in update_fields:
+        return False
+    old_image = getattr(post, '_old_image', None) or ''
+    new_image = post.image.name or ''
+    if new_image == old_image:
+        if reserved:
+            # Ту же картинку загрузили заново: ссылка на неё уже была
+            images.release(reserved)
+        return False
+    if new_image and not reserved:
+        images.acquire(new_image)
+    if old_image:
+        images.release(old_image)
+    return True
+
+
+@receiver(post_save, sender=Post)
+def post_saved(sender, instance, created, raw=False, update_fields=None,
+               **kwargs):
+    if raw:
+        return
+    if created:
+        stats.change_user(instance.author_id, posts_count=1)
+        timeline.fan_out(instance)
+    # Ленты подписчиков не сбрасываются: ключ их фрагмента строится из
+    # постов страницы и версий ('post', pk)
+    cache.bump(*_post_feeds(instance))
+    if _image_changed(instance, update_fields) and instance.image:
+        # Повторно загруженная картинка найдёт готовые миниатюры
+        image = instance.image
+        transaction.on_commit(lambda: thumbnails.schedule(image))
+
+
+@receiver(post_delete, sender=Post)
+def post_deleted(sender, instance, **kwargs):
+    stats.change_user(instance.author_id, posts_count=-1)
+    if instance.image:
+        images.release(instance.image.name)
+    cache.bump(*_post_feeds(instance))
+
+
+@receiver(post_save, sender=Comment)
+def comment_saved(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    if created:
+        stats.change_comments(instance.post_id, 1)
+    cache.bump(('post', instance.post_id))
+
+
+@receiver(post_delete, sender=Comment)
+def comment_deleted(sender, instance, **kwargs):
+    stats.change_comments(instance.post_id, -1)
+    cache.bump(('post', instance.post_id))
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def group_changed(sender, instance, raw=False, **kwargs):
+    if not raw:
+        cache.bump('groups', ('group', instance.pk))
+
+
+@receiver(post_save, sender=Follow)
+def follow_created(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        stats.change_user(instance.user_id, following_count=1)
+        stats.change_user(instance.author_id, followers_count=1)
+        timeline.backfill(instance.user_id, instance.author_id)
+        Suggestion.objects.filter(
+            user_id=instance.user_id, author_id=instance.author_id
+        ).delete()
+        _suggestions_changed(instance)
+        cache.bump(*_follow_feeds(instance))
+
+
+@receiver(post_delete, sender=Follow)
+def follow_deleted(sender, instance, **kwargs):
+    if follows.in_bulk():
+        return
+    stats.change_user(instance.user_id, following_count=-1)
+    stats.change_user(instance.author_id, followers_count=-1)
+    timeline.prune(instance.user_id, instance.author_id)
+    _suggestions_changed(instance)
+    cache.bump(*_follow_feeds(instance))
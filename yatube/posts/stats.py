@@ -0,0 +1,82 @@
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from .models import Comment, Follow, Post, User, UserStats
+
+
+def _counts(user_id):
+    return {
+        'posts_count': Post.objects.filter(author_id=user_id).count(),
+        'followers_count': Follow.objects.filter(author_id=user_id).count(),
+        'following_count': Follow.objects.filter(user_id=user_id).count(),
+    }
+
+
+def recount_user(user_id):
+    """Пересчитывает счётчики пользователя по таблицам."""
+    stats, _ = UserStats.objects.update_or_create(
+        user_id=user_id, defaults=_counts(user_id)
+    )
+    return stats
+
+
+def get_user_stats(user):
+    """Счётчики пользователя; если строки нет, считаются через COUNT."""
+    try:
+        return user.stats
+    except UserStats.DoesNotExist:
+        pass
+    try:
+        with transaction.atomic():
+            return recount_user(user.pk)
+    except IntegrityError:
+        return UserStats.objects.get(user_id=user.pk)
+
+
+def change_user(user_id, **deltas):
+    """Атомарно сдвигает счётчики на deltas через F().
+
+    Если строки ещё нет, её с верными числами создаст get_user_stats().
+    """
+    change_users([user_id], **deltas)
+
+
+def change_users(user_ids, **deltas):
+    """Сдвигает счётчики сразу многим пользователям одним UPDATE.
+
+    Разошедшийся счётчик не уменьшается ниже нуля: CHECK колонки уронил
+    бы удаление. Такая строка пропускается, её чинит recount_stats.
+    """
+    UserStats.objects.filter(
+        user_id__in=user_ids,
+        **{
+            f'{name}__gte': -delta
+            for name, delta in deltas.items() if delta < 0
+        }
+    ).update(**{
+        name: F(name) + delta for name, delta in deltas.items()
+    })
+
+
+def change_comments(post_id, delta):
+    guard = {'comments_count__gte': -delta} if delta < 0 else {}
+    Post.objects.filter(pk=post_id, **guard).update(
+        comments_count=F('comments_count') + delta
+    )
+
+
+def recount_all():
+    """Чинит расхождения всех счётчиков; возвращает число пользователей."""
+    Post.objects.update(comments_count=Coalesce(Subquery(
+        Comment.objects.filter(post=OuterRef('pk'))
+        .order_by()
+        .values('post')
+        .annotate(total=Count('pk'))
+        .values('total')
+    ), 0))
+    users = 0
+    for user_id in User.objects.values_list('pk', flat=True).iterator():
+        recount_user(user_id)
+        users += 1
+    return users
@@ -0,0 +1,22 @@
+import logging
+
+from django import template
+
+from posts import thumbnails
+
+logger = logging.getLogger(__name__)
+
+register = template.Library()
+
+
+@register.inclusion_tag('posts/includes/picture.html')
+def post_picture(image):
+    """<picture> с AVIF/WebP разных ширин и запасной картинкой."""
+    if not image:
+        return {'picture': None}
+    try:
+        return {'picture': thumbnails.picture(image)}
+    except Exception:
+        # Как и {% thumbnail %}, не роняем страницу из-за картинки
+        logger.exception('Не удалось подготовить миниатюры для %s', image)
+        return {'picture': None}
@@ -1,13 +1,22 @@
+import hashlib
+import os
 import shutil
 import tempfile
+from io import BytesIO, StringIO
+from unittest import mock
 
 from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
 from django.test import Client, TestCase, override_settings
 from django.urls import reverse
+from PIL import Image
+from sorl.thumbnail.default import kvstore
+from sorl.thumbnail.images import ImageFile
 
-from posts.models import Group, Post, Comment
+from posts.models import Comment, Group, ImageBlob, Post
+from posts import images, thumbnails
 from posts.forms import PostForm
 
 User = get_user_model()
@@ -88,7 +97,8 @@ class PostFormTests(TestCase):
         post_author_0 = first_post.author
         post_group_0 = first_post.group
         post_image = first_post.image
-        self.assertEqual(post_image.name, f'posts/{self.uploaded.name}')
+        digest = hashlib.sha256(self.small_gif).hexdigest()
+        self.assertEqual(post_image.name, f'posts/{digest[:2]}/{digest}.gif')
         self.assertEqual(Post.objects.count(), posts_count + 1)
         self.assertEqual(post_group_0, self.group_old)
         self.assertEqual(post_author_0, self.user)
@@ -213,3 +223,231 @@ class PostFormTests(TestCase):
         self.assertRedirects(
             response, expected_redirect
         )
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ThumbnailPipelineTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='photographer')
+        small_gif = (
+            b'\x47\x49\x46\x38\x39\x61\x01\x00'
+            b'\x01\x00\x00\x00\x00\x21\xf9\x04'
+            b'\x01\x0a\x00\x01\x00\x2c\x00\x00'
+            b'\x00\x00\x01\x00\x01\x00\x00\x02'
+            b'\x02\x4c\x01\x00\x3b'
+        )
+        cls.post = Post.objects.create(
+            text='Пост с картинкой',
+            author=cls.user,
+            image=SimpleUploadedFile(
+                name='thumb.gif',
+                content=small_gif,
+                content_type='image/gif'
+            )
+        )
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    @staticmethod
+    def generated():
+        return sorted(
+            name
+            for _, _, names in os.walk(os.path.join(TEMP_MEDIA_ROOT, 'cache'))
+            for name in names
+        )
+
+    def test_warm_thumbnails_command(self):
+        """warm_thumbnails заранее создаёт те миниатюры, что берут шаблоны."""
+        kvstore.delete_thumbnails(ImageFile(self.post.image))
+        out = StringIO()
+        call_command('warm_thumbnails', workers=1, stdout=out, stderr=out)
+        self.assertIn('Миниатюры готовы: 1, ошибок: 0', out.getvalue())
+        generated = self.generated()
+        self.assertEqual(len(generated), len(thumbnails.GEOMETRIES))
+        thumbnails.picture(self.post.image)
+        self.assertEqual(self.generated(), generated)
+
+    def test_collect_removes_warmed_thumbnails(self):
+        """Удаление файла без ссылок убирает и заранее созданные миниатюры."""
+        post = Post.objects.create(
+            text='Удаляемый пост',
+            author=self.user,
+            image=SimpleUploadedFile('gone.png', make_image((4, 4), 'PNG')),
+        )
+        before = self.generated()
+        thumbnails.warm(post.image.name)
+        name = post.image.name
+        post.delete()
+        self.assertTrue(images.collect(name))
+        self.assertEqual(self.generated(), before)
+
+
+def make_image(size, image_format='JPEG'):
+    content = BytesIO()
+    Image.new('RGB', size, 'navy').save(content, image_format)
+    return content.getvalue()
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ImageUploadGuardTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='uploader')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def create(self, name, content):
+        return self.client.post(reverse('posts:post_create'), {
+            'text': 'Снимок',
+            'image': SimpleUploadedFile(name, content, 'image/jpeg'),
+        })
+
+    @override_settings(UPLOAD_MAX_BYTES=2 ** 20)
+    def test_oversized_upload_rejected(self):
+        """Файл больше UPLOAD_MAX_BYTES не доходит до формы."""
+        response = self.create('big.jpg', b'\xff' * (2 ** 20 + 1))
+        self.assertEqual(response.status_code, 200)
+        self.assertFormError(response, 'form', 'image', 'Файл больше 1 МБ')
+        self.assertFalse(Post.objects.exists())
+
+    @override_settings(IMAGE_MAX_PIXELS=1000)
+    def test_too_many_pixels_rejected(self):
+        """Картинка больше IMAGE_MAX_PIXELS отклоняется по заголовку."""
+        response = self.create('wide.jpg', make_image((50, 40)))
+        self.assertFormError(
+            response, 'form', 'image', 'Картинка больше 0.001 мегапикселей'
+        )
+        self.assertFalse(Post.objects.exists())
+
+    @override_settings(IMAGE_MAX_SIDE=16)
+    def test_large_original_downscaled(self):
+        """Длинная сторона оригинала уменьшается до IMAGE_MAX_SIDE."""
+        self.create('large.jpg', make_image((64, 32)))
+        post = Post.objects.get()
+        with Image.open(post.image.path) as image:
+            self.assertEqual((image.format, image.size), ('JPEG', (16, 8)))
+
+    @override_settings(IMAGE_MAX_SIDE=16)
+    def test_small_original_kept(self):
+        """Картинка в пределах IMAGE_MAX_SIDE сохраняется без изменений."""
+        content = make_image((16, 12), 'PNG')
+        self.create('small.png', content)
+        with Post.objects.get().image.open() as image:
+            self.assertEqual(image.read(), content)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ImageDeduplicationTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='reposter')
+        cls.content = make_image((8, 8))
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def create(self, name, content):
+        return Post.objects.create(
+            text='Мем',
+            author=self.user,
+            image=SimpleUploadedFile(name, content, 'image/jpeg'),
+        )
+
+    def test_same_content_stored_once(self):
+        """Одинаковые картинки хранятся одним файлом с именем по хэшу."""
+        self.client.force_login(self.user)
+        self.client.post(reverse('posts:post_create'), {
+            'text': 'Мем',
+            'image': SimpleUploadedFile('one.jpg', self.content),
+        })
+        first = Post.objects.get()
+        second = self.create('two.JPG', self.content)
+        digest = hashlib.sha256(self.content).hexdigest()
+        self.assertEqual(first.image.name, f'posts/{digest[:2]}/{digest}.jpg')
+        self.assertEqual(second.image.name, first.image.name)
+        self.assertEqual(
+            os.listdir(os.path.dirname(first.image.path)),
+            [f'{digest}.jpg']
+        )
+        self.assertEqual(ImageBlob.objects.get().references, 2)
+
+    def test_file_removed_with_last_reference(self):
+        """Файл удаляется, только когда его не использует ни один пост."""
+        first = self.create('one.jpg', self.content)
+        second = self.create('two.jpg', self.content)
+        name, path = first.image.name, first.image.path
+        first.delete()
+        self.assertFalse(images.collect(name))
+        self.assertTrue(os.path.exists(path))
+        second.delete()
+        self.assertTrue(images.collect(name))
+        self.assertFalse(os.path.exists(path))
+        self.assertFalse(ImageBlob.objects.exists())
+
+    def test_reupload_during_release_keeps_file(self):
+        """Повторная загрузка не теряет файл, удаляемый после коммита."""
+        first = self.create('one.jpg', self.content)
+        name, path = first.image.name, first.image.path
+        first.delete()
+        # collect из on_commit удаления приходит в момент, когда
+        # хранилище уже нашло файл и решило его не записывать
+        storage = Post._meta.get_field('image').storage
+        exists = storage.exists
+
+        def exists_then_collect(checked):
+            found = exists(checked)
+            images.collect(checked)
+            return found
+
+        with mock.patch.object(storage, 'exists', exists_then_collect):
+            second = self.create('two.jpg', self.content)
+        self.assertEqual(second.image.name, name)
+        self.assertTrue(os.path.exists(path))
+        self.assertEqual(ImageBlob.objects.get().references, 1)
+        self.assertFalse(images.collect(name))
+        self.assertTrue(os.path.exists(path))
+
+    def test_reupload_after_collect_restores_file(self):
+        """Если файл уже удалён, та же картинка записывается заново."""
+        first = self.create('one.jpg', self.content)
+        name, path = first.image.name, first.image.path
+        first.delete()
+        self.assertTrue(images.collect(name))
+        second = self.create('two.jpg', self.content)
+        self.assertEqual(second.image.name, name)
+        self.assertTrue(os.path.exists(path))
+        self.assertEqual(ImageBlob.objects.get().references, 1)
+
+    def test_same_image_uploaded_again_keeps_one_reference(self):
+        """Повторная загрузка той же картинки в пост не добавляет ссылку."""
+        post = self.create('one.jpg', self.content)
+        post.image = SimpleUploadedFile('again.jpg', self.content)
+        post.save()
+        self.assertEqual(ImageBlob.objects.get().references, 1)
+
+    def test_replaced_image_released(self):
+        """Замена картинки при редактировании снимает ссылку со старой."""
+        post = self.create('old.jpg', self.content)
+        old_name = post.image.name
+        post.image = SimpleUploadedFile('new.png', make_image((8, 8), 'PNG'))
+        post.save(update_fields=['image'])
+        self.assertEqual(
+            dict(ImageBlob.objects.values_list('name', 'references')),
+            {old_name: 0, post.image.name: 1}
+        )
+        self.assertTrue(images.collect(old_name))
@@ -1,15 +1,32 @@
+import base64
+import io
+import json
+import re
 import shutil
 import tempfile
+import threading
+from hashlib import md5
+from unittest import mock
 
 from django import forms
 from django.conf import settings
+from django.contrib.admin.widgets import AutocompleteSelect
 from django.contrib.auth import get_user_model
 from django.core.cache import cache
 from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
 from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 
-from posts.models import Comment, Follow, Group, Post
+from posts import recommend, thumbnails
+from posts.cache import PAGE_KEY, get_version
+from posts.models import (Comment, Follow, Group, Post, StaleSuggestions,
+                          Suggestion, TimelineEntry, UserStats)
+from posts.recommend import FollowGraph
+
+from .utils import assert_max_queries
 
 User = get_user_model()
 
@@ -138,7 +155,7 @@ class PostPagesTests(TestCase):
         response = self.authorized_client.get(
             reverse('posts:post_detail', kwargs={'post_id': self.post.pk})
         )
-        first_object = response.context['page_obj'][0]
+        first_object = response.context['post']
         post_text_0 = first_object.text
         post_image = first_object.image
         self.assertEqual(post_image, self.post.image)
@@ -213,21 +230,87 @@ class PostPagesTests(TestCase):
         comment_form = response.context.get('form').fields.get('text')
         self.assertIsInstance(comment_form, comment_form_field['text'])
 
+    def test_post_image_rendered_as_picture(self):
+        """Картинка поста выводится как <picture> с производными."""
+        response = self.guest_client.get(
+            reverse('posts:post_detail', kwargs={'post_id': self.post.pk})
+        )
+        self.assertContains(response, '<picture>')
+        self.assertContains(response, 'width="960" height="339"')
+        for image_format in thumbnails.MODERN_FORMATS:
+            with self.subTest(image_format=image_format):
+                self.assertContains(
+                    response, f'type="{thumbnails.MIME_TYPES[image_format]}"'
+                )
+                for width in thumbnails.FEED_WIDTHS:
+                    self.assertContains(
+                        response,
+                        f'.{image_format.lower()} {width}w'
+                    )
+
     def test_cache_correct_index_page(self):
         """Проверка работы кэширования на главной странице"""
         response_0 = self.authorized_client.get(reverse('posts:index'))
 
-        post = Post.objects.create(text='Test', author=self.user,
-                                   group=self.group_1)
+        Post.objects.filter(pk=self.post.pk).update(text='Изменён мимо ORM')
         response_1 = self.authorized_client.get(reverse('posts:index'))
-        Post.objects.filter(id=post.id).delete()
+        self.assertEqual(response_0.content, response_1.content)
 
+        cache.clear()
         response_2 = self.authorized_client.get(reverse('posts:index'))
-        self.assertEqual(response_1.content, response_2.content)
-
+        self.assertNotEqual(response_1.content, response_2.content)
+        Post.objects.filter(pk=self.post.pk).update(text=self.post.text)
         cache.clear()
-        response_3 = self.authorized_client.get(reverse('posts:index'))
-        self.assertEqual(response_0.content, response_3.content)
+
+    def test_new_post_invalidates_feeds(self):
+        """Новый пост сразу виден на главной, в группе и в профиле."""
+        urls = (
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': self.group_1.slug}),
+            reverse('posts:profile', kwargs={'username': self.user}),
+        )
+        for url in urls:
+            self.authorized_client.get(url)
+        post = Post.objects.create(
+            text='Свежий пост', author=self.user, group=self.group_1
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                response = self.authorized_client.get(url)
+                self.assertContains(response, post.text)
+        post.delete()
+        for url in urls:
+            with self.subTest(url=url):
+                response = self.authorized_client.get(url)
+                self.assertNotContains(response, post.text)
+
+    def test_edit_invalidates_old_group(self):
+        """Перенос поста в другую группу обновляет ленты обеих групп."""
+        old_group_url = reverse(
+            'posts:group_list', kwargs={'slug': self.group_1.slug}
+        )
+        post = Post.objects.create(
+            text='Переезжающий пост', author=self.user, group=self.group_1
+        )
+        self.assertContains(self.guest_client.get(old_group_url), post.text)
+        post.group = self.group_2
+        post.save()
+        self.assertNotContains(
+            self.guest_client.get(old_group_url), post.text
+        )
+
+    def test_comment_invalidates_only_post(self):
+        """Комментарий обновляет страницу поста, но не главную."""
+        index_version = get_version('index', 'groups')
+        detail_url = reverse(
+            'posts:post_detail', kwargs={'post_id': self.post.pk}
+        )
+        self.guest_client.get(detail_url)
+        comment = Comment.objects.create(
+            post=self.post, text='Новый комментарий', author=self.user
+        )
+        self.assertContains(self.guest_client.get(detail_url), comment.text)
+        self.assertEqual(get_version('index', 'groups'), index_version)
 
 
 class FollowViewTest(TestCase):
@@ -329,6 +412,666 @@ class FollowViewTest(TestCase):
             response.context['page_obj'].object_list
         )
 
+    @override_settings(TIMELINE_MAX_ENTRIES=2)
+    def test_timeline_is_capped(self):
+        """rebuild_timeline --trim оставляет TIMELINE_MAX_ENTRIES постов."""
+        following = User.objects.create(username='following')
+        Follow.objects.create(user=self.user, author=following)
+        posts = [
+            Post.objects.create(author=following, text=f'Пост {i}')
+            for i in range(3)
+        ]
+        call_command(
+            'rebuild_timeline', '--trim', stdout=io.StringIO()
+        )
+        self.assertEqual(
+            set(
+                TimelineEntry.objects.filter(user=self.user)
+                .values_list('post', flat=True)
+            ),
+            {posts[1].pk, posts[2].pk}
+        )
+
+    def test_follow_feed_fragment_follows_post_changes(self):
+        """Фрагмент ленты подписок видит новые, правленые и удалённые
+        посты без сброса кэша каждого подписчика."""
+        reader = Client()
+        reader.force_login(self.user_2)
+        url = reverse('posts:follow_index')
+        self.assertContains(reader.get(url), self.post.text)
+        post = Post.objects.get(pk=self.post.pk)
+        post.text = 'Исправленный текст'
+        post.save()
+        self.assertContains(reader.get(url), 'Исправленный текст')
+        new_post = Post.objects.create(author=self.user, text='Свежий пост')
+        self.assertContains(reader.get(url), 'Свежий пост')
+        new_post.delete()
+        self.assertNotContains(reader.get(url), 'Свежий пост')
+
+    def test_post_changes_do_not_bump_follower_feeds(self):
+        """Пост сбрасывает постоянное число лент, сколько бы ни было
+        подписчиков."""
+        for i in range(5):
+            reader = User.objects.create(username=f'reader{i}')
+            Follow.objects.create(user=reader, author=self.user)
+        with mock.patch('posts.signals.cache.bump') as bump:
+            post = Post.objects.create(author=self.user, text='Для всех')
+            post.text = 'Правка'
+            post.save()
+            post.delete()
+        for call in bump.call_args_list:
+            self.assertNotIn('follow', [
+                feed[0] for feed in call.args if isinstance(feed, tuple)
+            ])
+
+    def test_fan_out_queries_do_not_grow_with_followers(self):
+        """Новый пост раскладывается по лентам без запроса на подписчика."""
+        author = User.objects.create(username='popular')
+        for i in range(50):
+            reader = User.objects.create(username=f'reader{i}')
+            Follow.objects.create(user=reader, author=author)
+        with CaptureQueriesContext(connection) as queries:
+            Post.objects.create(author=author, text='Для всех')
+        self.assertLess(len(queries), 10)
+
+    def test_rebuild_timeline_command(self):
+        """Команда rebuild_timeline восстанавливает ленту по подпискам."""
+        TimelineEntry.objects.all().delete()
+        call_command('rebuild_timeline', stdout=io.StringIO())
+        response = self.authorized_client.get(reverse('posts:follow_index'))
+        self.assertEqual(len(response.context['page_obj']), 0)
+        self.assertTrue(
+            TimelineEntry.objects.filter(
+                user=self.user_2, post=self.post
+            ).exists()
+        )
+
+
+class CountersTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='reader')
+        cls.author = User.objects.create_user(username='writer')
+        cls.post = Post.objects.create(author=cls.author, text='Пост')
+
+    def setUp(self):
+        cache.clear()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def stats(self, user):
+        return UserStats.objects.get(user=user)
+
+    def test_counters_follow_changes(self):
+        """Счётчики меняются вместе с постами, комментариями и подписками."""
+        Post.objects.create(author=self.author, text='Ещё пост')
+        self.assertEqual(self.stats(self.author).posts_count, 2)
+        self.authorized_client.post(
+            reverse('posts:add_comment', kwargs={'post_id': self.post.pk}),
+            data={'text': 'Комментарий'}
+        )
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comments_count, 1)
+        self.authorized_client.get(reverse(
+            'posts:profile_follow', kwargs={'username': self.author}
+        ))
+        self.assertEqual(self.stats(self.author).followers_count, 1)
+        self.assertEqual(self.stats(self.user).following_count, 1)
+        self.authorized_client.get(reverse(
+            'posts:profile_unfollow', kwargs={'username': self.author}
+        ))
+        Comment.objects.filter(post=self.post).delete()
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comments_count, 0)
+        self.assertEqual(self.stats(self.author).followers_count, 0)
+        self.assertEqual(self.stats(self.user).following_count, 0)
+
+    def test_edit_keeps_comments_count(self):
+        """Редактирование поста не затирает счётчик комментариев."""
+        Comment.objects.create(post=self.post, author=self.user, text='Да')
+        writer = Client()
+        writer.force_login(self.author)
+        writer.post(
+            reverse('posts:post_edit', kwargs={'post_id': self.post.pk}),
+            data={'text': 'Новый текст'}
+        )
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.text, 'Новый текст')
+        self.assertEqual(self.post.comments_count, 1)
+
+    def test_profile_uses_counters(self):
+        """Профиль берёт число постов из счётчика, без COUNT(*)."""
+        with CaptureQueriesContext(connection) as queries:
+            response = self.authorized_client.get(reverse(
+                'posts:profile', kwargs={'username': self.author}
+            ))
+        self.assertEqual(response.context['page_obj'].paginator.count, 1)
+        self.assertNotIn(
+            'COUNT', ' '.join(query['sql'] for query in queries)
+        )
+
+    def test_drifted_counters_do_not_go_negative(self):
+        """Удаление при обнулившемся счётчике не падает на CHECK >= 0."""
+        comment = Comment.objects.create(
+            post=self.post, author=self.user, text='Да'
+        )
+        follow = Follow.objects.create(user=self.user, author=self.author)
+        Post.objects.filter(pk=self.post.pk).update(comments_count=0)
+        UserStats.objects.filter(user=self.author).update(followers_count=0)
+        comment.delete()
+        follow.delete()
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comments_count, 0)
+        self.assertEqual(
+            UserStats.objects.get(user=self.author).followers_count, 0
+        )
+
+    def test_recount_stats_command(self):
+        """Команда recount_stats чинит разошедшиеся счётчики."""
+        UserStats.objects.filter(user=self.author).update(posts_count=7)
+        UserStats.objects.filter(user=self.user).delete()
+        Post.objects.filter(pk=self.post.pk).update(comments_count=3)
+        call_command('recount_stats', stdout=io.StringIO())
+        self.assertEqual(self.stats(self.author).posts_count, 1)
+        self.assertEqual(self.stats(self.user).posts_count, 0)
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comments_count, 0)
+
+
+@override_settings(DEFAULT_COMMENTS_PER_PAGE=3)
+class CommentsPaginationTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.post = Post.objects.create(
+            author=User.objects.create_user(username='writer'),
+            text='Обсуждаемый пост'
+        )
+        cls.comments = [
+            Comment.objects.create(
+                post=cls.post,
+                author=User.objects.create_user(username=f'reader_{i}'),
+                text=f'Комментарий {i}'
+            )
+            for i in range(7)
+        ]
+
+    def setUp(self):
+        cache.clear()
+
+    def test_detail_shows_newest_batch(self):
+        """На странице поста только первая порция, новые сверху."""
+        response = self.client.get(
+            reverse('posts:post_detail', kwargs={'post_id': self.post.pk})
+        )
+        comments = response.context['comments']
+        self.assertEqual(
+            list(comments), self.comments[::-1][:3]
+        )
+        self.assertContains(response, comments.next_cursor)
+
+    def test_fragment_walks_all_comments(self):
+        """Фрагмент отдаёт следующие порции до последнего комментария."""
+        url = reverse('posts:post_comments', kwargs={'post_id': self.post.pk})
+        seen = []
+        cursor = ''
+        while True:
+            with assert_max_queries(self, 3):
+                response = self.client.get(url, {'cursor': cursor})
+            self.assertTemplateUsed(response, 'includes/comment_list.html')
+            comments = response.context['comments']
+            seen.extend(comments)
+            if not comments.next_cursor:
+                break
+            cursor = comments.next_cursor
+        self.assertEqual(seen, self.comments[::-1])
+        self.assertNotContains(response, 'Показать ещё')
+
+
+class PostDetailTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='writer')
+        cls.group = Group.objects.create(
+            title='Группа', slug='group', description='Описание'
+        )
+        cls.posts = [
+            Post.objects.create(
+                author=cls.author, text=f'Пост {i}', group=cls.group
+            )
+            for i in range(settings.AUTHOR_POSTS_STRIP + 2)
+        ]
+        cls.post = cls.posts[-1]
+        cls.url = reverse('posts:post_detail', kwargs={'post_id': cls.post.pk})
+
+    def setUp(self):
+        cache.clear()
+
+    def test_post_detail_query_budget(self):
+        """Страница поста: пост с автором и группой, комментарии и блок
+        «Ещё от автора», который дальше берётся из кэша."""
+        with assert_max_queries(self, 3):
+            self.client.get(self.url)
+        with assert_max_queries(self, 2):
+            response = self.client.get(self.url)
+        self.assertEqual(response.context['author_stats'].posts_count, 7)
+        self.assertNotIn('page_obj', response.context)
+
+    def test_author_posts_strip(self):
+        """Блок «Ещё от автора» без текущего поста и не длиннее лимита."""
+        response = self.client.get(reverse(
+            'posts:post_detail', kwargs={'post_id': self.posts[-2].pk}
+        ))
+        self.assertEqual(
+            response.context['author_posts'],
+            [self.posts[-1], *self.posts[-3:-7:-1]]
+        )
+
+    def test_author_posts_strip_follows_new_posts(self):
+        """Новый пост автора сразу попадает в блок на странице поста."""
+        self.client.get(self.url)
+        new_post = Post.objects.create(author=self.author, text='Свежий')
+        response = self.client.get(self.url)
+        self.assertEqual(response.context['author_posts'][0], new_post)
+
+
+class ConditionalGetTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='writer')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Группа', slug='group', description='Описание'
+        )
+        cls.post = Post.objects.create(
+            author=cls.author, text='Пост', group=cls.group
+        )
+        cls.urls = {
+            'index': reverse('posts:index'),
+            'group': reverse('posts:group_list', kwargs={'slug': 'group'}),
+            'profile': reverse(
+                'posts:profile', kwargs={'username': 'writer'}
+            ),
+            'post': reverse(
+                'posts:post_detail', kwargs={'post_id': cls.post.pk}
+            ),
+        }
+
+    def setUp(self):
+        cache.clear()
+
+    def assertNotModified(self, url, etag):
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertFalse(response.content)
+
+    def test_unchanged_pages_answer_304(self):
+        """Повторный запрос с тем же ETag получает 304 без отрисовки."""
+        for name, url in self.urls.items():
+            with self.subTest(page=name):
+                etag = self.client.get(url)['ETag']
+                with assert_max_queries(self, 1):
+                    self.assertNotModified(url, etag)
+
+    def test_if_modified_since(self):
+        """Клиенты без ETag сравнивают Last-Modified."""
+        response = self.client.get(self.urls['index'])
+        response = self.client.get(
+            self.urls['index'],
+            HTTP_IF_MODIFIED_SINCE=response['Last-Modified']
+        )
+        self.assertEqual(response.status_code, 304)
+
+    def rename_group(self):
+        self.group.title = 'Новое название'
+        self.group.save()
+
+    def test_changes_produce_new_etag(self):
+        """Пост, комментарий, подписка и группа меняют ETag страниц."""
+        every_page = ('index', 'group', 'profile', 'post')
+        changes = (
+            (every_page, lambda: Post.objects.create(
+                author=self.author, text='Новый', group=self.group
+            )),
+            (('post',), lambda: Comment.objects.create(
+                post=self.post, author=self.reader, text='Комментарий'
+            )),
+            (('profile',), lambda: Follow.objects.create(
+                user=self.reader, author=self.author
+            )),
+            (every_page, self.rename_group),
+        )
+        for pages, change in changes:
+            etags = {
+                name: self.client.get(self.urls[name])['ETag']
+                for name in pages
+            }
+            change()
+            for name in pages:
+                with self.subTest(page=name):
+                    response = self.client.get(
+                        self.urls[name], HTTP_IF_NONE_MATCH=etags[name]
+                    )
+                    self.assertEqual(response.status_code, 200)
+
+    def test_etag_depends_on_user(self):
+        """Авторизованный пользователь не получает страницу гостя."""
+        etag = self.client.get(self.urls['index'])['ETag']
+        self.client.force_login(self.reader)
+        response = self.client.get(
+            self.urls['index'], HTTP_IF_NONE_MATCH=etag
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertNotModified(self.urls['index'], response['ETag'])
+
+    def test_etag_changes_with_csrf_token_after_login(self):
+        """После повторного входа форма комментария несёт новый токен."""
+        User.objects.create_user(username='commenter', password='password')
+        client = Client(enforce_csrf_checks=True)
+        login_url = reverse('users:login')
+        credentials = {'username': 'commenter', 'password': 'password'}
+
+        def log_in():
+            client.get(login_url)
+            client.post(login_url, {
+                **credentials,
+                'csrfmiddlewaretoken': client.cookies['csrftoken'].value,
+            })
+
+        log_in()
+        etag = client.get(self.urls['post'])['ETag']
+        client.logout()
+        log_in()
+        response = client.get(self.urls['post'], HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        token = re.search(
+            r'name="csrfmiddlewaretoken" value="(\w+)"',
+            response.content.decode()
+        ).group(1)
+        response = client.post(
+            reverse('posts:add_comment', kwargs={'post_id': self.post.pk}),
+            {'text': 'После входа', 'csrfmiddlewaretoken': token},
+        )
+        self.assertEqual(response.status_code, 302)
+
+
+class AnonymousPageCacheTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='writer')
+        Post.objects.create(author=cls.author, text='Первый пост')
+        cls.url = reverse('posts:index')
+        cls.key = PAGE_KEY.format(md5(cls.url.encode()).hexdigest())
+
+    def setUp(self):
+        cache.clear()
+
+    def test_guest_page_served_from_cache(self):
+        """Повторную страницу гость получает без SQL и отрисовки."""
+        first = self.client.get(self.url)
+        with assert_max_queries(self, 0):
+            second = self.client.get(self.url)
+        self.assertIsNone(second.context)
+        self.assertEqual(second.content, first.content)
+        self.assertEqual(second['ETag'], first['ETag'])
+
+    def test_new_post_invalidates_page(self):
+        """Новый пост сразу виден гостю."""
+        self.client.get(self.url)
+        Post.objects.create(author=self.author, text='Свежий пост')
+        self.assertContains(self.client.get(self.url), 'Свежий пост')
+
+    def test_pages_cached_separately(self):
+        """Номер страницы входит в ключ кэша."""
+        self.client.get(self.url)
+        response = self.client.get(self.url + '?page=2')
+        self.assertIsNotNone(response.context)
+
+    def test_authorized_user_bypasses_cache(self):
+        """Авторизованный пользователь всегда получает свою страницу."""
+        self.client.get(self.url)
+        self.client.force_login(self.author)
+        response = self.client.get(self.url)
+        self.assertIsNotNone(response.context)
+        self.assertContains(response, 'writer')
+
+    def test_concurrent_miss_waits_for_rebuild(self):
+        """Пока страницу рисует другой запрос, гость ждёт его результат."""
+        self.client.get(self.url)
+        entry = cache.get(self.key)
+        cache.delete(self.key)
+        cache.add(f'{self.key}:lock', 1)
+        threading.Timer(0.05, cache.set, (self.key, entry)).start()
+        with assert_max_queries(self, 0):
+            response = self.client.get(self.url)
+        self.assertIsNone(response.context)
+        self.assertEqual(response.status_code, 200)
+
+    @override_settings(PAGE_CACHE_WAIT=0.02)
+    def test_stuck_rebuild_falls_back_to_render(self):
+        """Если перестраивание зависло, гость рисует страницу сам."""
+        cache.add(f'{self.key}:lock', 1)
+        response = self.client.get(self.url)
+        self.assertIsNotNone(response.context)
+        self.assertContains(response, 'Первый пост')
+
+
+class SuggestionsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.users = {
+            name: User.objects.create_user(username=name)
+            for name in ('reader', 'friend', 'far', 'shared', 'similar')
+        }
+        for user, author in (
+            ('reader', 'friend'),
+            ('friend', 'far'),
+            ('friend', 'shared'),
+            ('similar', 'friend'),
+            ('similar', 'shared'),
+        ):
+            Follow.objects.create(
+                user=cls.users[user], author=cls.users[author]
+            )
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.users['reader'])
+
+    def suggested(self, name):
+        return list(
+            Suggestion.objects.filter(user=self.users[name])
+            .values_list('author__username', flat=True)
+        )
+
+    def test_graph_scores(self):
+        """Друзья друзей и совместные подписки складываются в оценку."""
+        graph = FollowGraph([1, 2, 3, 4, 5], [
+            (1, 2), (2, 3), (2, 4), (5, 2), (5, 4),
+        ])
+        self.assertEqual(graph.suggest(1, 2), [(4, 3.0), (3, 2.0)])
+        # Без подписок - самые популярные авторы, кроме себя
+        self.assertEqual(graph.suggest(4, 2), [(2, 0.0), (3, 0.0)])
+
+    def test_graph_scores_batches(self):
+        """Оценка пачкой совпадает с оценкой по одному пользователю."""
+        edges = [(1, 2), (2, 3), (2, 4), (5, 2), (5, 4), (3, 1), (4, 5)]
+        graph = FollowGraph([1, 2, 3, 4, 5, 6], edges)
+        single = {
+            user_id: graph.suggest(user_id, 3) for user_id in range(1, 7)
+        }
+        with mock.patch.object(recommend, 'SCORE_BATCH', 2):
+            self.assertEqual(graph.suggest_many(range(1, 8), 3), single)
+
+    def test_command_recomputes_stale_users(self):
+        """Команда пересчитывает только отмеченных читателей."""
+        self.assertTrue(
+            StaleSuggestions.objects.filter(
+                user_id=self.users['reader'].pk
+            ).exists()
+        )
+        call_command('recommend_follows', stdout=io.StringIO())
+        self.assertEqual(self.suggested('reader')[:2], ['shared', 'far'])
+        self.assertFalse(StaleSuggestions.objects.exists())
+
+        Suggestion.objects.all().delete()
+        call_command('recommend_follows', stdout=io.StringIO())
+        self.assertFalse(Suggestion.objects.exists())
+        call_command(
+            'recommend_follows', '--all', stdout=io.StringIO()
+        )
+        self.assertTrue(self.suggested('similar'))
+
+    def test_follow_marks_followers_stale(self):
+        """Новая подписка отмечает только читателя, а пересчёт захватывает
+        и его подписчиков; выбранный автор сразу пропадает из блока."""
+        call_command('recommend_follows', stdout=io.StringIO())
+        Follow.objects.create(
+            user=self.users['friend'], author=self.users['similar']
+        )
+        self.assertEqual(
+            list(StaleSuggestions.objects.values_list('user_id', flat=True)),
+            [self.users['friend'].pk]
+        )
+        self.assertNotIn('similar', self.suggested('friend'))
+        Suggestion.objects.filter(user=self.users['reader']).delete()
+        self.assertEqual(recommend.recompute(), 3)
+        self.assertEqual(self.suggested('reader')[:2], ['shared', 'far'])
+
+    def test_suggestions_shown_on_pages(self):
+        """Блок «Кого почитать» есть в профиле и в избранных авторах."""
+        call_command('recommend_follows', stdout=io.StringIO())
+        for url in (
+            reverse('posts:follow_index'),
+            reverse('posts:profile', kwargs={'username': 'friend'}),
+        ):
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertEqual(
+                    [item.author.username
+                     for item in response.context['suggestions']][:2],
+                    ['shared', 'far']
+                )
+                self.assertContains(response, 'Кого почитать')
+
+    def test_user_deletion_with_follows(self):
+        """Удаление пользователя каскадом не ломается на отметках."""
+        self.users['similar'].delete()
+        self.assertFalse(Follow.objects.filter(user__username='similar'))
+
+
+class BulkFollowTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.reader = User.objects.create_user(username='reader')
+        cls.authors = [
+            User.objects.create_user(username=f'author{i}') for i in range(20)
+        ]
+        for author in cls.authors:
+            Post.objects.create(author=author, text=f'Пост {author}')
+        cls.url = reverse('posts:follow_bulk')
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.reader)
+
+    def post(self, action, usernames):
+        return self.client.post(
+            self.url, {'action': action, 'usernames': ', '.join(usernames)}
+        )
+
+    def test_bulk_follow(self):
+        """Подписка на список авторов обновляет счётчики и ленту."""
+        response = self.post(
+            'follow', ['author0', 'author1', 'reader', 'nobody']
+        )
+        self.assertEqual(
+            response.json(),
+            {'changed': ['author0', 'author1'], 'missing': ['nobody']}
+        )
+        response = self.post('follow', ['author1', 'author2'])
+        self.assertEqual(response.json()['changed'], ['author2'])
+        self.assertEqual(
+            UserStats.objects.get(user=self.reader).following_count, 3
+        )
+        self.assertEqual(
+            UserStats.objects.get(user=self.authors[1]).followers_count, 1
+        )
+        self.assertEqual(
+            TimelineEntry.objects.filter(user=self.reader).count(), 3
+        )
+        self.assertEqual(
+            len(self.client.get(
+                reverse('posts:follow_index')
+            ).context['page_obj']),
+            3
+        )
+
+    def test_bulk_unfollow(self):
+        """Отписка списком убирает подписки, счётчики и посты из ленты."""
+        self.post('follow', ['author0', 'author1', 'author2'])
+        response = self.post('unfollow', ['author0', 'author2', 'author3'])
+        self.assertEqual(response.json()['changed'], ['author0', 'author2'])
+        self.assertEqual(
+            list(Follow.objects.filter(user=self.reader).values_list(
+                'author__username', flat=True
+            )),
+            ['author1']
+        )
+        self.assertEqual(
+            UserStats.objects.get(user=self.reader).following_count, 1
+        )
+        self.assertEqual(
+            UserStats.objects.get(user=self.authors[0]).followers_count, 0
+        )
+        self.assertEqual(
+            TimelineEntry.objects.filter(user=self.reader).count(), 1
+        )
+
+    def test_queries_do_not_grow_with_batch(self):
+        """Число запросов не зависит от размера пачки."""
+        counts = []
+        for names in (['author0', 'author1'], [
+            author.username for author in self.authors[2:]
+        ]):
+            with CaptureQueriesContext(connection) as queries:
+                self.post('follow', names)
+            counts.append(len(queries))
+        self.assertEqual(counts[0], counts[1])
+
+    def test_bad_requests(self):
+        """Неизвестное действие, пустой и слишком длинный список - 400."""
+        self.assertEqual(self.client.get(self.url).status_code, 405)
+        self.assertEqual(self.post('block', ['author0']).status_code, 400)
+        self.assertEqual(self.post('follow', []).status_code, 400)
+        with override_settings(FOLLOW_BATCH_SIZE=2):
+            response = self.post('follow', ['author0', 'author1', 'author2'])
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Follow.objects.exists())
+
+    @override_settings(FOLLOW_BATCH_SIZE=7)
+    def test_import_follows_command(self):
+        """Команда читает список из файла и пишет его пачками."""
+        with tempfile.NamedTemporaryFile('w', suffix='.txt') as source:
+            source.write('\n'.join(
+                [author.username for author in self.authors] + ['author0']
+            ))
+            source.flush()
+            call_command(
+                'import_follows', 'reader', source.name,
+                stdout=io.StringIO()
+            )
+        self.assertEqual(Follow.objects.filter(user=self.reader).count(), 20)
+        self.assertEqual(
+            UserStats.objects.get(user=self.reader).following_count, 20
+        )
+
 
 class PaginatorViewsTest(TestCase):
     @classmethod
@@ -353,6 +1096,7 @@ class PaginatorViewsTest(TestCase):
         Post.objects.bulk_create(objs)
 
     def setUp(self):
+        cache.clear()
         self.guest_client = Client()
         self.authorized_client = Client()
         self.authorized_client.force_login(self.user)
@@ -417,3 +1161,275 @@ class PaginatorViewsTest(TestCase):
             len(response_2.context['page_obj']),
             posts_count_2_pages
         )
+
+    def test_cursor_pages_cover_feed(self):
+        """Курсоры next/previous проходят ленту без пропусков и повторов."""
+        response = self.guest_client.get(reverse('posts:index'))
+        first_page = list(response.context['page_obj'])
+        next_cursor = response.context['page_obj'].next_cursor
+        self.assertIsNone(response.context['page_obj'].previous_cursor)
+        response_2 = self.guest_client.get(
+            reverse('posts:index'), {'cursor': next_cursor}
+        )
+        page_obj_2 = response_2.context['page_obj']
+        self.assertEqual(page_obj_2.number, 2)
+        self.assertIsNone(page_obj_2.next_cursor)
+        self.assertEqual(
+            first_page + list(page_obj_2),
+            list(Post.objects.order_by('-pub_date', '-pk'))
+        )
+        response_back = self.guest_client.get(
+            reverse('posts:index'), {'cursor': page_obj_2.previous_cursor}
+        )
+        self.assertEqual(list(response_back.context['page_obj']), first_page)
+        self.assertEqual(response_back.context['page_obj'].number, 1)
+
+    def test_cursor_page_skips_count(self):
+        """Страница по курсору не выполняет COUNT(*) и OFFSET."""
+        response = self.guest_client.get(
+            reverse('posts:group_list', kwargs={'slug': self.group_1.slug})
+        )
+        next_cursor = response.context['page_obj'].next_cursor
+        with CaptureQueriesContext(connection) as queries:
+            self.guest_client.get(
+                reverse(
+                    'posts:group_list',
+                    kwargs={'slug': self.group_1.slug}
+                ),
+                {'cursor': next_cursor}
+            )
+        for query in queries.captured_queries:
+            self.assertNotIn('COUNT(', query['sql'])
+            self.assertNotIn('OFFSET', query['sql'])
+
+    def test_broken_cursor_returns_first_page(self):
+        """Испорченный курсор открывает первую страницу."""
+        response = self.guest_client.get(
+            reverse('posts:index'), {'cursor': 'not-a-cursor'}
+        )
+        self.assertEqual(response.context['page_obj'].number, 1)
+        self.assertEqual(
+            len(response.context['page_obj']),
+            settings.DEFAULT_POSTS_PER_PAGE
+        )
+
+    def test_crafted_cursor_returns_first_page(self):
+        """Курсор с null и не строками открывает первую страницу."""
+        payloads = (
+            [[None, None], 2, True],
+            [['', ''], 2, True],
+            [[[], {}], 2, True],
+            [[1, 2], 2, True],
+            ['ab', 2, True],
+            [{'a': 1, 'b': 2}, 2, True],
+            [['2020-01-01', '1'], None, True],
+        )
+        for payload in payloads:
+            cursor = base64.urlsafe_b64encode(
+                json.dumps(payload).encode()
+            ).decode()
+            with self.subTest(payload=payload):
+                response = self.guest_client.get(
+                    reverse('posts:index'), {'cursor': cursor}
+                )
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(response.context['page_obj'].number, 1)
+
+
+class QueryCountViewsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Общая группа',
+            slug='common',
+            description='Описание общей группы'
+        )
+        for i in range(settings.DEFAULT_POSTS_PER_PAGE):
+            author = User.objects.create_user(
+                username=f'author_{i}', first_name='Имя', last_name=str(i)
+            )
+            Follow.objects.create(user=cls.user, author=author)
+            Post.objects.create(
+                author=author,
+                text=f'Пост {i}',
+                group=Group.objects.create(
+                    title=f'Группа {i}',
+                    slug=f'group-{i}',
+                    description='Описание'
+                ) if i % 2 else cls.group,
+            )
+        cls.author = author
+
+    def setUp(self):
+        cache.clear()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def test_feed_views_query_budget(self):
+        """Число запросов ленты не зависит от количества постов."""
+        budgets = {
+            reverse('posts:index'): 3,
+            reverse('posts:group_list', kwargs={'slug': self.group.slug}): 4,
+            reverse(
+                'posts:profile', kwargs={'username': self.author.username}
+            ): 6,
+            reverse('posts:follow_index'): 3,
+        }
+        for url, budget in budgets.items():
+            with self.subTest(url=url):
+                with assert_max_queries(self, budget):
+                    self.authorized_client.get(url)
+
+
+class SearchViewTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='writer')
+        cls.superuser = User.objects.create_superuser(
+            username='admin', email='admin@example.com', password='pass'
+        )
+        cls.weak = Post.objects.create(
+            author=cls.user, text='Один кот и много <b>собак</b>'
+        )
+        cls.strong = Post.objects.create(
+            author=cls.user, text='Кот, кот и ещё раз кот'
+        )
+        cls.other = Post.objects.create(author=cls.user, text='Про собак')
+
+    def setUp(self):
+        self.guest_client = Client()
+
+    def test_search_ranks_and_highlights(self):
+        """Поиск находит посты по словам, ранжирует и подсвечивает."""
+        response = self.guest_client.get(reverse('posts:search'), {'q': 'кот'})
+        posts = list(response.context['page_obj'])
+        self.assertEqual(posts, [self.strong, self.weak])
+        self.assertContains(response, '<mark>кот</mark>')
+        self.assertContains(response, '&lt;b&gt;собак&lt;/b&gt;')
+
+    def test_search_follows_edits_and_deletes(self):
+        """Индекс обновляется при изменении и удалении поста."""
+        self.other.text = 'Теперь про кота'
+        self.other.save()
+        response = self.guest_client.get(
+            reverse('posts:search'), {'q': 'Теперь'}
+        )
+        self.assertEqual(list(response.context['page_obj']), [self.other])
+        self.other.delete()
+        response = self.guest_client.get(
+            reverse('posts:search'), {'q': 'Теперь'}
+        )
+        self.assertEqual(len(response.context['page_obj']), 0)
+
+    def test_search_cursor_pagination(self):
+        """Результаты поиска листаются курсором с сохранением запроса."""
+        Post.objects.bulk_create(
+            Post(author=self.user, text=f'кот номер {i}')
+            for i in range(settings.DEFAULT_POSTS_PER_PAGE)
+        )
+        response = self.guest_client.get(reverse('posts:search'), {'q': 'кот'})
+        page_obj = response.context['page_obj']
+        self.assertContains(response, 'q=%D0%BA%D0%BE%D1%82&amp;cursor=')
+        response_2 = self.guest_client.get(
+            reverse('posts:search'),
+            {'q': 'кот', 'cursor': page_obj.next_cursor}
+        )
+        found = list(page_obj) + list(response_2.context['page_obj'])
+        self.assertEqual(len(found), settings.DEFAULT_POSTS_PER_PAGE + 2)
+        self.assertEqual(len(set(found)), len(found))
+
+    def test_search_syntax_is_escaped(self):
+        """Операторы FTS5 в запросе не ломают поиск."""
+        response = self.guest_client.get(
+            reverse('posts:search'), {'q': '"кот* OR NEAR('}
+        )
+        self.assertEqual(response.status_code, 200)
+
+    def test_admin_search_uses_index(self):
+        """Поиск в админке использует тот же индекс."""
+        client = Client()
+        client.force_login(self.superuser)
+        response = client.get(
+            reverse('admin:posts_post_changelist'), {'q': 'собак'}
+        )
+        self.assertEqual(
+            set(response.context['cl'].result_list),
+            {self.weak, self.other}
+        )
+
+
+class AdminChangelistTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.superuser = User.objects.create_superuser(
+            username='admin', email='admin@example.com', password='pass'
+        )
+        cls.groups = [
+            Group.objects.create(title=f'Группа {i}', slug=f'group-{i}')
+            for i in range(3)
+        ]
+        for i in range(6):
+            Post.objects.create(
+                author=User.objects.create_user(username=f'author{i}'),
+                group=cls.groups[i % 3],
+                text=f'Пост {i}',
+            )
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.superuser)
+
+    def test_changelist_queries_do_not_grow_with_rows(self):
+        """Строки changelist не запрашивают авторов и группы по одной."""
+        for url in (
+            reverse('admin:posts_post_changelist'),
+            reverse('admin:posts_comment_changelist'),
+            reverse('admin:posts_follow_changelist'),
+        ):
+            with self.subTest(url=url):
+                # Сессия, пользователь, оценка и точный COUNT маленькой
+                # таблицы, список групп и сами строки
+                with assert_max_queries(self, 7):
+                    self.client.get(url)
+
+    def test_group_choices_follow_group_changes(self):
+        """Кэш списка групп сбрасывается при создании группы."""
+        url = reverse('admin:posts_post_changelist')
+        response = self.client.get(url)
+        self.assertContains(response, 'Группа 2</option>', count=6)
+        Group.objects.create(title='Новая группа', slug='new')
+        response = self.client.get(url)
+        self.assertContains(response, 'Новая группа</option>', count=6)
+
+    @override_settings(ADMIN_EXACT_COUNT_LIMIT=1)
+    def test_large_table_count_is_estimated(self):
+        """Без фильтров число строк берётся из размаха ключа."""
+        url = reverse('admin:posts_post_changelist')
+        Post.objects.filter(text='Пост 2').delete()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.context['cl'].result_count, 6)
+        self.assertFalse(any(
+            'COUNT(' in query['sql'] for query in queries.captured_queries
+        ))
+        response = self.client.get(url, {'q': 'Пост'})
+        self.assertEqual(response.context['cl'].result_count, 5)
+
+    def test_change_forms_do_not_list_all_users(self):
+        """Авторы и посты выбираются поиском, а не списком всех строк."""
+        for url, name in (
+            (reverse('admin:posts_post_add'), 'author'),
+            (reverse('admin:posts_comment_add'), 'author'),
+            (reverse('admin:posts_follow_add'), 'user'),
+        ):
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                field = response.context['adminform'].form.fields[name]
+                self.assertIsInstance(
+                    field.widget.widget, AutocompleteSelect
+                )
+                self.assertNotContains(response, 'author5</option>')
@@ -0,0 +1,15 @@
+from contextlib import contextmanager
+
+from core.queries import QueryWatcher
+
+
+@contextmanager
+def assert_max_queries(testcase, limit):
+    """Падает, если блок выполнил больше limit SQL-запросов или N+1."""
+    with QueryWatcher() as watcher:
+        yield watcher
+    problems = watcher.problems(limit)
+    testcase.assertFalse(
+        problems,
+        '\n'.join(problems + ['Запросы:', *watcher.statements])
+    )
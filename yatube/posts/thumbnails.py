@@ -0,0 +1,116 @@
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import connection
+from PIL import Image
+from sorl.thumbnail import base, get_thumbnail
+from sorl.thumbnail.images import ImageFile
+
+from .models import Post
+
+logger = logging.getLogger(__name__)
+
+# Пропорции картинки в лентах и на странице поста
+FEED_SIZE = (960, 339)
+# Ширины производных для srcset
+FEED_WIDTHS = (480, 960)
+FEED_OPTIONS = {'crop': 'center', 'upscale': True}
+
+MIME_TYPES = {'AVIF': 'image/avif', 'WEBP': 'image/webp'}
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _modern_formats():
+    Image.init()
+    supported = []
+    for image_format in MIME_TYPES:
+        if image_format in Image.SAVE:
+            # sorl-thumbnail 12.7 не знает расширения .avif
+            base.EXTENSIONS.setdefault(image_format, image_format.lower())
+            supported.append(image_format)
+    return tuple(supported)
+
+
+MODERN_FORMATS = _modern_formats()
+
+
+def _geometry(width):
+    height = round(width * FEED_SIZE[1] / FEED_SIZE[0])
+    return f'{width}x{height}'
+
+
+def _derivatives(image_format):
+    options = dict(FEED_OPTIONS, format=image_format)
+    return [(width, _geometry(width), options) for width in FEED_WIDTHS]
+
+
+# Все миниатюры, которые запрашивает тег {% post_picture %}
+GEOMETRIES = ((_geometry(FEED_SIZE[0]), FEED_OPTIONS),) + tuple(
+    (geometry, options)
+    for image_format in MODERN_FORMATS
+    for _, geometry, options in _derivatives(image_format)
+)
+
+
+def picture(image):
+    """Источники для <picture>: AVIF/WebP по ширинам и запасной <img>."""
+    sources = [
+        {
+            'type': MIME_TYPES[image_format],
+            'srcset': ', '.join(
+                f'{get_thumbnail(image, geometry, **options).url} {width}w'
+                for width, geometry, options in _derivatives(image_format)
+            ),
+        }
+        for image_format in MODERN_FORMATS
+    ]
+    fallback = get_thumbnail(image, _geometry(FEED_SIZE[0]), **FEED_OPTIONS)
+    return {
+        'sources': sources,
+        'url': fallback.url,
+        'width': fallback.width,
+        'height': fallback.height,
+    }
+
+
+def source(name):
+    """Картинка поста по имени файла.
+
+    sorl ключует миниатюры по имени и хранилищу, поэтому голая строка
+    попала бы в default_storage, и шаблон её миниатюр бы не нашёл.
+    """
+    return ImageFile(name, Post._meta.get_field('image').storage)
+
+
+def warm(name):
+    """Создаёт все миниатюры картинки, которые понадобятся шаблонам."""
+    image = source(name)
+    for geometry, options in GEOMETRIES:
+        get_thumbnail(image, geometry, **options)
+
+
+def _warm_in_background(name):
+    try:
+        warm(name)
+    except Exception:
+        logger.exception('Не удалось создать миниатюры для %s', name)
+    finally:
+        connection.close()
+
+
+def schedule(image):
+    """Ставит генерацию миниатюр в очередь пула потоков."""
+    global _executor
+    if not image or not settings.THUMBNAIL_WORKERS:
+        return None
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.THUMBNAIL_WORKERS,
+                thread_name_prefix='thumbnails'
+            )
+    return _executor.submit(_warm_in_background, image.name)
@@ -0,0 +1,121 @@
+from django.conf import settings
+from django.db import connections, router
+
+from .models import Follow, Post, TimelineEntry
+
+# Читателей в одном IN: столько параметров SQLite принимает без вопросов
+TRIM_BATCH = 500
+
+TRIM_SQL = """
+    DELETE FROM {table} WHERE id IN (
+        SELECT id FROM (
+            SELECT id, ROW_NUMBER() OVER (
+                PARTITION BY user_id ORDER BY pub_date DESC, post_id DESC
+            ) AS position
+            FROM {table}{where}
+        ) WHERE position > %s
+    )
+"""
+
+
+def _add_entries(entries):
+    TimelineEntry.objects.bulk_create(
+        entries, batch_size=500, ignore_conflicts=True
+    )
+
+
+def _trim(cursor, user_ids=None):
+    where, params = '', []
+    if user_ids is not None:
+        where = f" WHERE user_id IN ({', '.join(['%s'] * len(user_ids))})"
+        params = list(user_ids)
+    cursor.execute(
+        TRIM_SQL.format(table=TimelineEntry._meta.db_table, where=where),
+        params + [settings.TIMELINE_MAX_ENTRIES]
+    )
+    return cursor.rowcount
+
+
+def trim(user_ids=None):
+    """Оставляет в лентах не больше TIMELINE_MAX_ENTRIES последних постов.
+
+    Один DELETE с ROW_NUMBER() на пачку читателей, без user_ids - на все
+    ленты. Новые посты ленты не обрезают, это делает периодический
+    rebuild_timeline --trim. Возвращает число удалённых записей.
+    """
+    connection = connections[router.db_for_write(TimelineEntry)]
+    with connection.cursor() as cursor:
+        if user_ids is None:
+            return _trim(cursor)
+        user_ids = list(user_ids)
+        return sum(
+            _trim(cursor, user_ids[start:start + TRIM_BATCH])
+            for start in range(0, len(user_ids), TRIM_BATCH)
+        )
+
+
+def follower_ids(author_id):
+    return list(
+        Follow.objects.filter(author_id=author_id)
+        .values_list('user_id', flat=True)
+    )
+
+
+def fan_out(post):
+    """Раскладывает новый пост по лентам подписчиков автора.
+
+    Возвращает id читателей, чьи ленты изменились. Лишние старые записи
+    остаются до trim(): страницы ленты читаются с LIMIT, а обрезка на
+    каждый пост стоила бы запроса на подписчика.
+    """
+    user_ids = follower_ids(post.author_id)
+    _add_entries(
+        TimelineEntry(user_id=user_id, post=post, pub_date=post.pub_date)
+        for user_id in user_ids
+    )
+    return user_ids
+
+
+def backfill(user_id, *author_ids):
+    """Добавляет в ленту читателя последние посты новых авторов."""
+    posts = (
+        Post.objects.filter(author_id__in=author_ids)
+        .order_by('-pub_date', '-pk')
+        .values_list('pk', 'pub_date')[:settings.TIMELINE_MAX_ENTRIES]
+    )
+    _add_entries(
+        TimelineEntry(user_id=user_id, post_id=post_id, pub_date=pub_date)
+        for post_id, pub_date in posts
+    )
+    trim([user_id])
+
+
+def prune(user_id, *author_ids):
+    """Убирает из ленты читателя посты авторов, от которых он отписался."""
+    TimelineEntry.objects.filter(
+        user_id=user_id, post__author_id__in=author_ids
+    ).delete()
+
+
+def rebuild(user_ids=None):
+    """Пересобирает ленты с нуля по текущим подпискам."""
+    follows = Follow.objects.all()
+    entries = TimelineEntry.objects.all()
+    if user_ids is not None:
+        follows = follows.filter(user_id__in=user_ids)
+        entries = entries.filter(user_id__in=user_ids)
+    entries.delete()
+    authors = {}
+    for user_id, author_id in follows.values_list('user_id', 'author_id'):
+        authors.setdefault(user_id, []).append(author_id)
+    for user_id, author_ids in authors.items():
+        posts = (
+            Post.objects.filter(author_id__in=author_ids)
+            .order_by('-pub_date', '-pk')
+            .values_list('pk', 'pub_date')[:settings.TIMELINE_MAX_ENTRIES]
+        )
+        _add_entries(
+            TimelineEntry(user_id=user_id, post_id=post_id, pub_date=pub_date)
+            for post_id, pub_date in posts
+        )
+    return len(authors)
@@ -1,72 +1,209 @@
 from django.conf import settings
 from django.contrib.auth.decorators import login_required
-from django.core.paginator import Paginator
+from django.http import JsonResponse
 from django.shortcuts import get_object_or_404, redirect, render
+from django.views.decorators.http import require_POST
 
+from core import db
+from core.paginator import CursorPaginator
+from core.queries import query_budget
+from core.replicas import read_replica, write_primary
+
+from . import follows
+from . import search as post_search
+from . import stats
+from .cache import (FeedValidators, anonymous_page, feed_context,
+                    get_or_set)
 from .forms import CommentForm, PostForm
-from .models import Follow, Group, Post, User
+from .models import (FEED_FIELDS, Follow, Group, Post, Suggestion,
+                     TimelineEntry, User)
 
 
-def get_page_context(queryset, request):
-    paginator = Paginator(queryset, settings.DEFAULT_POSTS_PER_PAGE)
+def get_page_context(queryset, request, total=None,
+                     ordering=('-pub_date', '-pk')):
+    paginator = CursorPaginator(
+        queryset,
+        settings.DEFAULT_POSTS_PER_PAGE,
+        ordering=ordering,
+        total=total
+    )
     page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    cursor = request.GET.get('cursor')
+    page_obj = paginator.get_cursor_page(cursor, page_number)
     return {
         'paginator': paginator,
         'page_number': page_number,
+        'cursor': cursor,
         'page_obj': page_obj,
     }
 
 
+def get_comments_page(post, cursor):
+    """Порция комментариев поста, новые сверху, без COUNT(*)."""
+    paginator = CursorPaginator(
+        post.comments.select_related('author').only(
+            'text', 'created', 'post', 'author__username',
+            'author__first_name', 'author__last_name'
+        ),
+        settings.DEFAULT_COMMENTS_PER_PAGE,
+        ordering=('-created', '-pk'),
+        total=post.comments_count
+    )
+    return paginator.get_cursor_page(cursor)
+
+
+@read_replica
+@query_budget(3)
+@anonymous_page
 def index(request):
-    context = get_page_context(Post.objects.all(), request)
-    return render(request, 'posts/index.html', context)
+    validators = FeedValidators(request, 'index', 'groups')
+    not_modified = validators.not_modified(request)
+    if not_modified:
+        return not_modified
+    context = get_page_context(Post.objects.for_feed(), request)
+    context.update(validators.context())
+    return validators.apply(render(request, 'posts/index.html', context))
 
 
+@read_replica
+@query_budget(4)
+@anonymous_page
 def group_posts(request, slug):
     group = get_object_or_404(Group, slug=slug)
-    posts = group.posts_group.all()
+    validators = FeedValidators(request, ('group', group.pk))
+    not_modified = validators.not_modified(request)
+    if not_modified:
+        return not_modified
+    posts = group.posts_group.for_feed()
     context = {
         'group': group,
         'posts': posts,
+        **validators.context(),
     }
     context.update(get_page_context(posts, request))
-    return render(request, 'posts/group_list.html', context)
+    return validators.apply(
+        render(request, 'posts/group_list.html', context)
+    )
 
 
+@read_replica
+@query_budget(6)
+@anonymous_page
 def profile(request, username):
-    author = get_object_or_404(User, username=username)
-    posts = author.posts.all()
+    author = get_object_or_404(
+        User.objects.select_related('stats'), username=username
+    )
+    feeds = [('profile', author.pk), 'groups']
+    if request.user.is_authenticated:
+        feeds.append(('suggestions', request.user.pk))
+    validators = FeedValidators(request, *feeds)
+    not_modified = validators.not_modified(request)
+    if not_modified:
+        return not_modified
+    posts = author.posts.for_feed()
     following = request.user.is_authenticated and Follow.objects.filter(
-        user__username=request.user,
+        user=request.user,
         author=author
     ).exists()
+    author_stats = stats.get_user_stats(author)
     context = {
         'author': author,
+        'author_stats': author_stats,
         'posts': posts,
         'following': following,
+        'suggestions': get_suggestions(request.user),
+        **validators.context(),
     }
-    context.update(get_page_context(posts, request))
-    return render(request, 'posts/profile.html', context)
+    context.update(
+        get_page_context(posts, request, total=author_stats.posts_count)
+    )
+    return validators.apply(render(request, 'posts/profile.html', context))
+
+
+def get_suggestions(user):
+    """Блок «Кого почитать»: живёт в кэше до пересчёта рекомендаций."""
+    if not user.is_authenticated:
+        return []
+    return get_or_set(
+        ('suggestions', user.pk),
+        'list',
+        lambda: list(
+            Suggestion.objects.filter(user=user)
+            .select_related('author')
+            .only(
+                'author__username',
+                'author__first_name',
+                'author__last_name',
+            )[:settings.SUGGESTIONS_SHOWN]
+        )
+    )
 
 
+def get_author_posts(author_id, exclude):
+    """Последние посты автора для блока «Ещё от автора»."""
+    latest = get_or_set(
+        ('profile', author_id),
+        'latest',
+        lambda: list(
+            Post.objects.for_feed()
+            .filter(author_id=author_id)[:settings.AUTHOR_POSTS_STRIP + 1]
+        )
+    )
+    return [
+        post for post in latest if post.pk != exclude
+    ][:settings.AUTHOR_POSTS_STRIP]
+
+
+@read_replica
+@query_budget(5)
 def post_detail(request, post_id):
-    post = get_object_or_404(Post, pk=post_id)
+    post = get_object_or_404(
+        Post.objects.select_related('author__stats', 'group'), pk=post_id
+    )
     author = post.author
-    posts = author.posts.all()
-    form = CommentForm()
-    comments = post.comments.all()
+    # Счётчик постов и блок «Ещё от автора» зависят от версии профиля,
+    # название группы - от 'groups'
+    validators = FeedValidators(
+        request, ('post', post.pk), ('profile', author.pk), 'groups'
+    )
+    not_modified = validators.not_modified(request)
+    if not_modified:
+        return not_modified
+    comments_cursor = request.GET.get('comments')
     context = {
         'post': post,
         'author': author,
-        'form': form,
-        'comments': comments,
+        'author_stats': stats.get_user_stats(author),
+        'author_posts': get_author_posts(author.pk, post.pk),
+        'form': CommentForm(),
+        'comments': get_comments_page(post, comments_cursor),
+        'comments_cursor': comments_cursor,
+        **validators.context(),
     }
-    context.update(get_page_context(posts, request))
-    return render(request, 'posts/post_detail.html', context)
+    return validators.apply(
+        render(request, 'posts/post_detail.html', context)
+    )
+
+
+@read_replica
+@query_budget(4)
+def post_comments(request, post_id):
+    """Следующая порция комментариев фрагментом HTML для подгрузки."""
+    post = get_object_or_404(
+        Post.objects.only('pk', 'comments_count'), pk=post_id
+    )
+    comments_cursor = request.GET.get('cursor')
+    context = {
+        'post': post,
+        'comments': get_comments_page(post, comments_cursor),
+        'comments_cursor': comments_cursor,
+        **feed_context(('post', post.pk)),
+    }
+    return render(request, 'includes/comment_list.html', context)
 
 
 @login_required
+@write_primary
 def post_create(request):
     form = PostForm(request.POST or None, files=request.FILES or None,)
     if form.is_valid():
@@ -83,6 +220,7 @@ def post_create(request):
 
 
 @login_required
+@write_primary
 def post_edit(request, post_id):
     post = get_object_or_404(Post, pk=post_id)
     author = post.author
@@ -96,7 +234,8 @@ def post_edit(request, post_id):
         instance=post
     )
     if form.is_valid():
-        form.save()
+        # Счётчик комментариев меняется в обход формы, не затираем его
+        form.save(commit=False).save(update_fields=form.Meta.fields)
         return redirect('posts:post_detail', post_id=post.pk)
     context = {
         'form': form,
@@ -108,6 +247,7 @@ def post_edit(request, post_id):
 
 
 @login_required
+@write_primary
 def add_comment(request, post_id):
     post = get_object_or_404(Post, pk=post_id)
     form = CommentForm(request.POST or None)
@@ -115,32 +255,103 @@ def add_comment(request, post_id):
         comment = form.save(commit=False)
         comment.author = request.user
         comment.post = post
-        comment.save()
+        db.submit(comment.save).result()
     return redirect('posts:post_detail', post_id=post.pk)
 
 
 @login_required
+@read_replica
+@query_budget(4)
 def follow_index(request):
     context = get_page_context(
-        Post.objects.filter(
-            author__following__user=request.user
+        TimelineEntry.objects.filter(
+            user=request.user
+        ).select_related('post__author', 'post__group').only(
+            'pub_date', 'post', 'post__author', 'post__group',
+            *(f'post__{field}' for field in FEED_FIELDS)
         ),
-        request
+        request,
+        ordering=('-pub_date', '-post_id')
     )
+    page_obj = context['page_obj']
+    page_obj.object_list = [entry.post for entry in page_obj]
+    context['suggestions'] = get_suggestions(request.user)
+    # Новый или удалённый пост меняет состав страницы, правка - версию
+    # его ленты ('post', pk); на каждого подписчика ничего не сбрасывается
+    context['page_posts'] = [post.pk for post in page_obj]
+    context.update(feed_context(
+        ('follow', request.user.pk),
+        'groups',
+        *(('post', post.pk) for post in page_obj)
+    ))
     return render(request, 'posts/follow.html', context)
 
 
 @login_required
+@write_primary
 def profile_follow(request, username):
     author = get_object_or_404(User, username=username)
     if request.user != author:
-        Follow.objects.get_or_create(user=request.user, author=author)
+        db.submit(
+            Follow.objects.get_or_create, user=request.user, author=author
+        ).result()
     return redirect('posts:profile', username)
 
 
 @login_required
+@write_primary
 def profile_unfollow(request, username):
     author = get_object_or_404(User, username=username)
     follower = Follow.objects.filter(user=request.user, author=author)
-    follower.delete()
+    db.submit(follower.delete).result()
     return redirect('posts:profile', username)
+
+
+BULK_FOLLOW_ACTIONS = {
+    'follow': follows.follow_many,
+    'unfollow': follows.unfollow_many,
+}
+
+
+@login_required
+@write_primary
+@require_POST
+def follow_bulk(request):
+    """Массовая подписка: usernames через пробел, запятую или строками."""
+    action = BULK_FOLLOW_ACTIONS.get(request.POST.get('action', 'follow'))
+    usernames = request.POST.get('usernames', '').replace(',', ' ').split()
+    if action is None or not usernames:
+        return JsonResponse(
+            {'error': 'Нужны action=follow|unfollow и usernames'}, status=400
+        )
+    try:
+        changed, missing = db.submit(
+            action, request.user, usernames
+        ).result()
+    except ValueError as error:
+        return JsonResponse({'error': str(error)}, status=400)
+    return JsonResponse({'changed': changed, 'missing': missing})
+
+
+@query_budget(4)
+def search(request):
+    query = request.GET.get('q', '').strip()
+    context = {'query': query}
+    if not post_search.match_expression(query):
+        return render(request, 'posts/search.html', context)
+    if post_search.available():
+        context.update(get_page_context(
+            post_search.matching(query),
+            request,
+            ordering=('rank', 'post_id')
+        ))
+        page_obj = context['page_obj']
+        for entry in page_obj:
+            entry.post.highlighted = post_search.highlight(entry.highlighted)
+        page_obj.object_list = [entry.post for entry in page_obj]
+    else:
+        context.update(get_page_context(
+            Post.objects.for_feed().filter(text__icontains=query),
+            request
+        ))
+    return render(request, 'posts/search.html', context)
@@ -0,0 +1,22 @@
+"""Настройки выбираются переменной окружения YATUBE_ENV.
+
+dev (по умолчанию) - отладка и debug_toolbar; prod - боевой профиль;
+bench - как prod, но с данными нагрузочных тестов в отдельном каталоге.
+"""
+import os
+
+from django.core.exceptions import ImproperlyConfigured
+
+YATUBE_ENV = os.getenv('YATUBE_ENV', 'dev')
+
+if YATUBE_ENV == 'dev':
+    from .dev import *  # noqa: F401,F403
+elif YATUBE_ENV == 'prod':
+    from .prod import *  # noqa: F401,F403
+elif YATUBE_ENV == 'bench':
+    from .bench import *  # noqa: F401,F403
+else:
+    raise ImproperlyConfigured(
+        f'Неизвестный профиль YATUBE_ENV={YATUBE_ENV!r}: '
+        'ожидается dev, prod или bench'
+    )
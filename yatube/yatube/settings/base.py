@@ -0,0 +1,273 @@
+"""
+Django settings for yatube project: общая часть всех профилей.
+
+Generated by 'django-admin startproject' using Django 2.2.19.
+
+For more information on this file, see
+https://docs.djangoproject.com/en/2.2/topics/settings/
+
+For the full list of settings and their values, see
+https://docs.djangoproject.com/en/2.2/ref/settings/
+"""
+
+import os
+
+# Build paths inside the project like this: os.path.join(BASE_DIR, ...)
+BASE_DIR = os.path.dirname(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+)
+
+# Quick-start development settings - unsuitable for production
+# See https://docs.djangoproject.com/en/2.2/howto/deployment/checklist/
+
+# SECURITY WARNING: keep the secret key used in production secret!
+SECRET_KEY = 'sbyx-wfw+*%r1zug=67@v$oe+#)65(=#%&2*w=7ht299)lsv1!'
+
+# SECURITY WARNING: don't run with debug turned on in production!
+DEBUG = False
+
+ALLOWED_HOSTS = [
+    'localhost',
+    '127.0.0.1',
+    '[::1]',
+    'testserver',
+]
+
+INTERNAL_IPS = [
+    '127.0.0.1',
+]
+
+LOGIN_URL = 'users:login'
+LOGIN_REDIRECT_URL = 'posts:index'
+# LOGOUT_REDIRECT_URL = 'posts:index'
+
+#  подключаем движок filebased.EmailBackend
+EMAIL_BACKEND = 'django.core.mail.backends.filebased.EmailBackend'
+# указываем директорию, в которую будут складываться файлы писем
+EMAIL_FILE_PATH = os.path.join(BASE_DIR, 'sent_emails')
+
+# Static files (CSS, JavaScript, Images)
+# https://docs.djangoproject.com/en/2.2/howto/static-files/
+
+MEDIA_URL = '/media/'
+MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
+
+# Загрузки сразу пишутся на диск; файл больше UPLOAD_MAX_BYTES
+# отбрасывается, не дочитываясь. Картинка больше IMAGE_MAX_PIXELS
+# отклоняется по заголовку, длинная сторона больше IMAGE_MAX_SIDE
+# уменьшается при загрузке.
+FILE_UPLOAD_HANDLERS = ['core.uploads.LimitedUploadHandler']
+UPLOAD_MAX_BYTES = 10 * 2 ** 20
+IMAGE_MAX_PIXELS = 40 * 10 ** 6
+IMAGE_MAX_SIDE = 2560
+
+# Application definition
+
+INSTALLED_APPS = [
+    'posts.apps.PostsConfig',
+    'django.contrib.admin',
+    'django.contrib.auth',
+    'django.contrib.contenttypes',
+    'django.contrib.sessions',
+    'django.contrib.messages',
+    'django.contrib.staticfiles',
+    'users.apps.UsersConfig',
+    'core.apps.CoreConfig',
+    'about.apps.AboutConfig',
+    'sorl.thumbnail',
+]
+
+MIDDLEWARE = [
+    'core.middleware.MetricsMiddleware',
+    'core.queries.QueryWatchMiddleware',
+    'core.replicas.ReplicaMiddleware',
+    'django.middleware.security.SecurityMiddleware',
+    'django.contrib.sessions.middleware.SessionMiddleware',
+    'django.middleware.common.CommonMiddleware',
+    'django.middleware.csrf.CsrfViewMiddleware',
+    'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'django.contrib.messages.middleware.MessageMiddleware',
+    'django.middleware.clickjacking.XFrameOptionsMiddleware',
+]
+
+ROOT_URLCONF = 'yatube.urls'
+
+TEMPLATE_LOADERS = [
+    'django.template.loaders.filesystem.Loader',
+    'django.template.loaders.app_directories.Loader',
+]
+
+TEMPLATES = [
+    {
+        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'DIRS': [os.path.join(BASE_DIR, 'templates')],
+        'OPTIONS': {
+            'loaders': [
+                ('django.template.loaders.cached.Loader', TEMPLATE_LOADERS),
+            ],
+            'context_processors': [
+                'django.template.context_processors.debug',
+                'django.template.context_processors.request',
+                'django.contrib.auth.context_processors.auth',
+                'django.contrib.messages.context_processors.messages',
+                'core.context_processors.year.year',
+            ],
+        },
+    },
+]
+
+WSGI_APPLICATION = 'yatube.wsgi.application'
+
+
+# Database
+# https://docs.djangoproject.com/en/2.2/ref/settings/#databases
+
+DATABASES = {
+    'default': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
+    }
+}
+
+# Копии основной базы для чтения лент: пути через запятую. Обновляются
+# командой sync_replicas
+REPLICA_DATABASES = {
+    f'replica{index}': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': path,
+        'TEST': {'MIRROR': 'default'},
+    }
+    for index, path in enumerate(
+        filter(None, os.getenv('YATUBE_SQLITE_REPLICAS', '').split(',')), 1
+    )
+}
+DATABASES.update(REPLICA_DATABASES)
+DATABASE_REPLICAS = list(REPLICA_DATABASES)
+DATABASE_ROUTERS = ['core.replicas.ReplicaRouter']
+# С реплик читаются только ленты: вход и сессии должны видеть свежие
+# строки сразу, а реплики обновляются по команде
+REPLICA_APPS = ['posts']
+# Столько секунд после записи клиент читает только основную базу
+REPLICA_PIN_SECONDS = 10
+REPLICA_PIN_COOKIE = 'read_primary_until'
+
+# Применяются к каждому новому подключению SQLite (core.db)
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'mmap_size': 256 * 1024 * 1024,
+    'cache_size': -64000,
+    'busy_timeout': 5000,
+}
+# Комментарии и подписки пишутся пачками из одного потока
+WRITE_QUEUE_BATCH = 64
+WRITE_QUEUE_LINGER = 0.002
+
+
+# Password validation
+# https://docs.djangoproject.com/en/2.2/ref/settings/#auth-password-validators
+
+AUTH_PASSWORD_VALIDATORS = [
+    {
+        'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
+    },
+    {
+        'NAME': 'django.contrib.auth.password_validation.MinimumLengthValidator',
+    },
+    {
+        'NAME': 'django.contrib.auth.password_validation.CommonPasswordValidator',
+    },
+    {
+        'NAME': 'django.contrib.auth.password_validation.NumericPasswordValidator',
+    },
+]
+
+
+# Internationalization
+# https://docs.djangoproject.com/en/2.2/topics/i18n/
+
+LANGUAGE_CODE = 'ru'
+
+TIME_ZONE = 'UTC'
+
+USE_I18N = True
+
+USE_L10N = True
+
+USE_TZ = True
+
+
+# Static files (CSS, JavaScript, Images)
+# https://docs.djangoproject.com/en/2.2/howto/static-files/
+
+STATIC_URL = '/static/'
+STATICFILES_DIRS = [os.path.join(BASE_DIR, 'static')]
+
+DEFAULT_POSTS_PER_PAGE = 10
+DEFAULT_COMMENTS_PER_PAGE = 20
+# Сколько постов показывать в блоке «Ещё от автора» на странице поста
+AUTHOR_POSTS_STRIP = 5
+
+# Сколько последних постов хранится в ленте подписок одного читателя
+TIMELINE_MAX_ENTRIES = 1000
+
+CSRF_FAILURE_VIEW = 'core.views.csrf_failure'
+
+# Проверка SQL по видам: '' - выключена, 'log' - предупреждения в лог,
+# 'strict' - исключение при выходе за query_budget или N+1 (включает
+# QueryWatchRunner в тестах)
+QUERY_WATCH = ''
+QUERY_SLOW_THRESHOLD = 0.1
+QUERY_REPEAT_THRESHOLD = 3
+# Первая отрисовка картинки пишет ключи sorl в БД; в работе миниатюры
+# заранее создаёт thumbnails.schedule, поэтому в бюджет это не входит
+QUERY_WATCH_IGNORE_TABLES = ('thumbnail_kvstore',)
+TEST_RUNNER = 'core.runner.QueryWatchRunner'
+
+# Фрагменты лент инвалидируются сигналами, поэтому TTL может быть долгим.
+# Отрисованное с реплики могло отстать от версии ленты и живёт недолго
+FEED_CACHE_TTL = 60 * 60 * 6
+REPLICA_CACHE_TTL = 10
+# Сколько секунд гости ждут страницу, которую уже рисует другой запрос,
+# и через сколько зависшая блокировка перестраивания снимается сама
+PAGE_CACHE_WAIT = 2
+PAGE_CACHE_LOCK_TIMEOUT = 10
+
+# «Кого почитать»: сколько авторов хранится и показывается на читателя
+# и со скольких соседей берётся выборка совместных подписок
+SUGGESTIONS_TOP_K = 10
+SUGGESTIONS_SHOWN = 5
+SUGGESTIONS_SAMPLE = 50
+
+# Столько авторов принимает одна массовая подписка или отписка
+FOLLOW_BATCH_SIZE = 500
+
+# С этого числа строк админка оценивает размер таблицы вместо COUNT(*)
+ADMIN_EXACT_COUNT_LIMIT = 100000
+
+# Бэкенд кэша выбирается переменной окружения YATUBE_CACHE.
+# 'shared' - общий для всех воркеров файл SQLite, без внешних сервисов.
+CACHE_BACKENDS = {
+    'locmem': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'shared': {
+        'BACKEND': 'core.cache.SQLiteCache',
+        'LOCATION': os.path.join(BASE_DIR, 'cache', 'cache.sqlite3'),
+        'OPTIONS': {
+            'MAX_ENTRIES': 10000,
+        },
+    },
+}
+
+CACHES = {
+    'default': CACHE_BACKENDS[os.getenv('YATUBE_CACHE', 'locmem')],
+}
+
+SESSION_ENGINE = 'django.contrib.sessions.backends.db'
+
+# sorl-thumbnail хранит ключи миниатюр в том же общем кэше
+THUMBNAIL_CACHE = 'default'
+
+# Потоки, заранее создающие миниатюры новых постов; 0 - не создавать
+THUMBNAIL_WORKERS = 2
@@ -0,0 +1,33 @@
+import os
+import tempfile
+
+from .prod import *  # noqa: F401,F403
+from .prod import CACHE_BACKENDS, DATABASES
+
+# База, медиа и кэш нагрузочных тестов лежат в одном известном каталоге,
+# чтобы benchmarks.seed и benchmarks.load работали с одними данными
+BENCH_DATA_DIR = os.getenv(
+    'YATUBE_BENCH_DIR', os.path.join(tempfile.gettempdir(), 'yatube-bench')
+)
+
+# Реплики и CONN_MAX_AGE остаются из prod, меняется только путь
+DATABASES = {
+    **DATABASES,
+    'default': {
+        **DATABASES['default'],
+        'NAME': os.path.join(BENCH_DATA_DIR, 'bench.sqlite3'),
+    },
+}
+
+MEDIA_ROOT = os.path.join(BENCH_DATA_DIR, 'media')
+
+CACHES = {
+    'default': dict(CACHE_BACKENDS[os.getenv('YATUBE_CACHE', 'shared')]),
+}
+if CACHES['default']['BACKEND'] == 'core.cache.SQLiteCache':
+    CACHES['default']['LOCATION'] = os.path.join(
+        BENCH_DATA_DIR, 'cache.sqlite3'
+    )
+
+# Миниатюры создаёт benchmarks.seed, фоновые потоки только мешают замерам
+THUMBNAIL_WORKERS = 0
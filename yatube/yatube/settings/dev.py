@@ -0,0 +1,20 @@
+import copy
+import mimetypes
+
+from .base import *  # noqa: F401,F403
+from .base import INSTALLED_APPS, MIDDLEWARE, TEMPLATES
+
+DEBUG = True
+
+INSTALLED_APPS = INSTALLED_APPS + ['debug_toolbar']
+
+MIDDLEWARE = MIDDLEWARE + ['debug_toolbar.middleware.DebugToolbarMiddleware']
+
+# Загрузчики по умолчанию без кэша: правки шаблонов видны без перезапуска
+TEMPLATES = copy.deepcopy(TEMPLATES)
+del TEMPLATES[0]['OPTIONS']['loaders']
+TEMPLATES[0]['APP_DIRS'] = True
+
+QUERY_WATCH = 'log'
+
+mimetypes.add_type("application/javascript", ".js", True)
@@ -0,0 +1,28 @@
+import os
+
+from .base import *  # noqa: F401,F403
+from .base import CACHE_BACKENDS, DATABASES, SECRET_KEY
+
+DEBUG = False
+
+SECRET_KEY = os.getenv('YATUBE_SECRET_KEY', SECRET_KEY)
+
+if os.getenv('YATUBE_ALLOWED_HOSTS'):
+    ALLOWED_HOSTS = os.getenv('YATUBE_ALLOWED_HOSTS').split(',')
+
+# Соединение с БД живёт между запросами воркера
+DATABASES = {
+    alias: {
+        **database,
+        'CONN_MAX_AGE': int(os.getenv('YATUBE_CONN_MAX_AGE', 60)),
+    }
+    for alias, database in DATABASES.items()
+}
+
+# Воркеры делят кэш, иначе инвалидация лент видна только одному из них
+CACHES = {
+    'default': CACHE_BACKENDS[os.getenv('YATUBE_CACHE', 'shared')],
+}
+
+# Сессия читается из кэша, в БД идёт только запись
+SESSION_ENGINE = 'django.contrib.sessions.backends.cached_db'